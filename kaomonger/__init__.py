@@ -0,0 +1,9 @@
+'''
+Kaomonger
+Scrape, clean, tag and search kaomoji. The tools are the modules of this
+package; `kaomonger <command>` (kaomonger.cli) runs any of them.
+'''
+
+
+class WorkspaceError(RuntimeError):
+    """No workspace (cleaned/, dirty_json/, ...) could be located"""
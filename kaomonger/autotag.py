@@ -0,0 +1,74 @@
+'''
+Kaomoji Auto-tagging
+Non-interactive part of cleaning: content normalization, flag classification
+and keyword matching, shared by the review loop and the pretag stage
+'''
+import re
+
+from .classify import classify, classify_many
+from .instrument import STATS
+from .keywords import KeywordRegistry
+
+# Species/emotion keyword lists, loaded once and written through in batches
+KEYWORDS = KeywordRegistry()
+
+def is_dot_art(content):
+    """Check if content is primarily dot art characters"""
+    return classify(content).dotArt
+
+def has_emoji(content):
+    """Check if content contains emoji characters"""
+    return classify(content).hasEmoji
+
+def is_multiline(content):
+    """Check if content contains newlines"""
+    return classify(content).multiLine
+
+def clean_content(content):
+    """Clean content by normalizing whitespace"""
+    # Only normalize invisible/control characters, preserve visible layout
+    # Replace invisible Unicode whitespace with visible braille space
+    content = re.sub(r'[\u2000-\u200F\u2028-\u202F\u205F\u2060\u3000\ufeff]', '⠀', content)
+    # Preserve newlines and multiple spaces for layout
+    return content
+
+def auto_tag_species(misc_tags):
+    """Extract species tags from misc tags"""
+    return KEYWORDS.auto_tag_species(misc_tags)
+
+def auto_tag_emotion(misc_tags):
+    """Extract emotion tags from misc tags"""
+    return KEYWORDS.auto_tag_emotion(misc_tags)
+
+def auto_tag_kaomoji(kaomoji_data, flags=None):
+    """Auto-populate the cleaned fields of a messy kaomoji entry
+
+    Args:
+        flags: Classification of the content if already computed
+    """
+    content = kaomoji_data.get('content', '')
+    misc = kaomoji_data.get('misc', [])
+    with STATS.stage('classify'):
+        if flags is None:
+            flags = classify(content)
+        content = clean_content(content)
+    with STATS.stage('tag'):
+        species = auto_tag_species(misc)
+        emotion = auto_tag_emotion(misc)
+    
+    return {
+        'content': content,
+        'species': species,
+        'emotion': emotion,
+        'misc': misc,
+        'dotArt': flags.dotArt,
+        'hasEmoji': flags.hasEmoji,
+        'multiLine': flags.multiLine
+    }
+
+def auto_tag_many(messy_data):
+    """auto_tag_kaomoji for every entry of a messy file, classified in one batch"""
+    with STATS.stage('classify'):
+        all_flags = classify_many(kaomoji_data.get('content', '') for kaomoji_data in messy_data.values())
+    return {kaomoji_id: auto_tag_kaomoji(kaomoji_data, flags)
+            for (kaomoji_id, kaomoji_data), flags in zip(messy_data.items(), all_flags)}
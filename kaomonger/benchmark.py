@@ -0,0 +1,337 @@
+'''
+Pipeline Benchmark
+Times each pipeline stage on synthetic corpora, on its own and end to end,
+and compares the results against a saved JSON baseline
+
+Corpora mix three kinds of content: short kaomoji, large braille dot art and
+emoji-heavy combos. Interactive review is replaced by accepting the
+auto-tagged record, and tagging runs against fixed keyword lists instead of
+species.txt/emotions.txt, so every run is unattended and reproducible for a
+seed.
+'''
+import argparse
+import html
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .autotag import KEYWORDS, auto_tag_many, clean_content
+from .classify import classify_many
+from .keywords import KeywordRegistry
+from .near_duplicates import cluster_variants
+from .pretag import load_pretagged, pretag_file
+from .scrape_to_messy_json import CHUNK_SIZE, build_messy_json, iter_kaomoji, save_messy_json
+from .work_queue import WorkQueue
+
+# Bump when stages change what they measure, so old baselines are rejected
+BASELINE_VERSION = 2
+DEFAULT_MIX = 'short=0.7,braille=0.2,emoji=0.1'
+REGRESSION_THRESHOLD = 1.25
+
+_BRACKETS = ['()', '[]', '（）', 'ʕʔ', '༼༽', '{}']
+_EYES = ['^', '•', '◕', '´', '`', 'ಠ', '≧', '≦', '˘', 'o', 'T', '╥', '°', '⊙']
+_MOUTHS = ['ω', 'ᴥ', '▽', '_', '‿', '﹏', 'д', 'ε', '∀', '◡', 'ー']
+_ARMS = ['', 'ノ', 'づ', '╯', '☆', '♡', '✧', 'ง']
+_EMOJI = ['😀', '🐱', '🐶', '💖', '✨', '🔥', '🥺', '👉👈', '🏳️‍🌈', '👩‍💻', '1️⃣', '🇯🇵', '❤️', '🦊']
+# Keyword fixture the corpus is tagged against, in the species.txt format
+BENCH_SPECIES = ['cat = kitty, neko', 'bear', 'dog = puppy', 'fox', 'bunny = rabbit', 'ghost', 'bird', 'frog']
+BENCH_EMOTIONS = ['happy = joy', 'sad', 'love', 'angry', 'sleepy', 'cute', 'scared', 'confused']
+_WORDS = ['cute', 'happy', 'sad', 'cat', 'bear', 'dog', 'love', 'angry', 'sleepy', 'art',
+          'big', 'text', 'random', 'funny', 'meme', 'cool', 'heart', 'fox', 'bunny', 'ghost']
+
+
+def parse_mix(text):
+    """Parse 'kind=weight,...' into normalized weights"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.strip().partition('=')
+        if kind not in GENERATORS:
+            raise argparse.ArgumentTypeError(f"unknown content kind {kind!r}, expected one of {', '.join(GENERATORS)}")
+        try:
+            mix[kind] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for {kind}: {weight!r}")
+    total = sum(mix.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("mix weights must add up to more than zero")
+    return {kind: round(weight / total, 4) for kind, weight in mix.items()}
+
+
+def short_kaomoji(rng):
+    left, right = rng.choice(_BRACKETS)
+    eye = rng.choice(_EYES)
+    arm = rng.choice(_ARMS)
+    return f"{arm}{left}{eye}{rng.choice(_MOUTHS)}{eye}{right}{arm}"
+
+
+def braille_art(rng, width=40, height=20):
+    rows = []
+    for _ in range(height):
+        # Mostly blank cells with dense runs, like real dot art
+        rows.append(''.join(chr(0x2800 + (rng.randrange(256) if rng.random() < 0.6 else 0))
+                            for _ in range(rng.randint(width // 2, width))))
+    return '\n'.join(rows)
+
+
+def emoji_combo(rng):
+    parts = [rng.choice(_EMOJI) for _ in range(rng.randint(2, 6))]
+    parts.insert(rng.randrange(len(parts) + 1), short_kaomoji(rng))
+    return ' '.join(parts)
+
+
+GENERATORS = {
+    'short': short_kaomoji,
+    'braille': braille_art,
+    'emoji': emoji_combo,
+}
+
+
+@contextmanager
+def fixed_keywords():
+    """Tag against BENCH_SPECIES/BENCH_EMOTIONS instead of the live keyword files"""
+    saved = KEYWORDS.species, KEYWORDS.emotions
+    with tempfile.TemporaryDirectory(prefix='kaomoji_bench_') as keyword_dir:
+        for name, lines in (('species.txt', BENCH_SPECIES), ('emotions.txt', BENCH_EMOTIONS)):
+            Path(keyword_dir, name).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        fixture = KeywordRegistry(keyword_dir)
+        KEYWORDS.species, KEYWORDS.emotions = fixture.species, fixture.emotions
+        try:
+            yield
+        finally:
+            KEYWORDS.species, KEYWORDS.emotions = saved
+
+
+def random_tags(rng):
+    vocabulary = _WORDS + KEYWORDS.species.sorted_tags()[:20] + KEYWORDS.emotions.sorted_tags()[:20]
+    return rng.sample(vocabulary, rng.randint(1, 6))
+
+
+def generate_records(count, mix, seed):
+    """Synthetic (content, tags) pairs following the content mix"""
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    return [(GENERATORS[rng.choices(kinds, weights)[0]](rng), random_tags(rng)) for _ in range(count)]
+
+
+def render_page(records, page_number):
+    """An HTML page with the container markup emojicombos.com uses"""
+    parts = [f'<!DOCTYPE html><html><head><title>Page {page_number}</title></head><body>\n'
+             '<nav class="menu"><a href="/">Home</a> <a href="/cute">cute</a></nav>\n']
+    for i, (content, tags) in enumerate(records):
+        parts.append(
+            f'<div class="box-module combo-ctn" data-combo-hash="{page_number}-{i}" '
+            f'data-keyphrases="{html.escape(",".join(tags))}" data-combo="{html.escape(content)}">'
+            f'<div class="combo-actions"><button>Copy</button></div></div>\n')
+    parts.append('</body></html>\n')
+    return ''.join(parts)
+
+
+def generate_pages(records, per_page):
+    return [render_page(records[start:start + per_page], start // per_page)
+            for start in range(0, len(records), per_page)]
+
+
+def chunked(text, size=CHUNK_SIZE):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def stub_review(records):
+    """Accept every auto-tagged record, as a reviewer who changes nothing would"""
+    return {kaomoji_id: record for kaomoji_id, record in records.items()}
+
+
+# Stages take the generated corpus and return the number of items processed
+
+def stage_parse_html(corpus):
+    return sum(len(build_messy_json(iter_kaomoji(chunked(page)))) for page in corpus['pages'])
+
+
+def stage_classify(corpus):
+    classify_many(corpus['contents'])
+    return len(corpus['contents'])
+
+
+def stage_clean_content(corpus):
+    for content in corpus['contents']:
+        clean_content(content)
+    return len(corpus['contents'])
+
+
+def stage_auto_tag(corpus):
+    auto_tag_many(corpus['messy'])
+    return len(corpus['messy'])
+
+
+def stage_cluster(corpus):
+    cluster_variants({kaomoji_id: data['content'] for kaomoji_id, data in corpus['messy'].items()})
+    return len(corpus['messy'])
+
+
+def stage_write_cleaned(corpus):
+    """Queue, commit and export one cleaned shard"""
+    work_dir = Path(tempfile.mkdtemp(prefix='kaomoji_bench_'))
+    try:
+        dirty_file = work_dir / 'bench.json'
+        save_messy_json(corpus['messy'], str(dirty_file))
+        queue = WorkQueue(work_dir / 'queue.sqlite')
+        queue.enqueue_file(dirty_file)
+        queue.start_session('cleaned_kaomoji_bench.json')
+        queue.commit('cleaned_kaomoji_bench.json', corpus['tagged'])
+        queue.export_session('cleaned_kaomoji_bench.json', work_dir)
+        queue.close()
+    finally:
+        shutil.rmtree(work_dir)
+    return len(corpus['tagged'])
+
+
+def stage_end_to_end(corpus):
+    """HTML pages to a cleaned shard, with review stubbed out"""
+    work_dir = Path(tempfile.mkdtemp(prefix='kaomoji_bench_'))
+    try:
+        dirty_dir = work_dir / 'dirty_json'
+        staging_dir = work_dir / 'pretagged'
+        dirty_dir.mkdir()
+        staging_dir.mkdir()
+        for i, page in enumerate(corpus['pages']):
+            save_messy_json(build_messy_json(iter_kaomoji(chunked(page))), str(dirty_dir / f'page{i}.json'))
+
+        queue = WorkQueue(work_dir / 'queue.sqlite')
+        session = 'cleaned_kaomoji_bench.json'
+        queue.start_session(session)
+        for dirty_file in sorted(dirty_dir.glob('*.json')):
+            pretag_file(dirty_file, staging_dir)
+            queue.enqueue_file(dirty_file)
+            queue.attach_pretagged(load_pretagged(dirty_file, staging_dir))
+            claimed = {kaomoji_id: pretagged for kaomoji_id, _, pretagged in queue.claim(dirty_file.name)}
+            queue.commit(session, stub_review(claimed))
+        _, saved = queue.export_session(session, work_dir)
+        queue.close()
+    finally:
+        shutil.rmtree(work_dir)
+    return saved
+
+
+STAGES = {
+    'parse_html': stage_parse_html,
+    'classify': stage_classify,
+    'clean_content': stage_clean_content,
+    'auto_tag': stage_auto_tag,
+    'cluster': stage_cluster,
+    'write_cleaned': stage_write_cleaned,
+    'end_to_end': stage_end_to_end,
+}
+
+
+def build_corpus(count, mix, seed, per_page):
+    records = generate_records(count, mix, seed)
+    pages = generate_pages(records, per_page)
+    messy = {}
+    for page in pages:
+        messy.update(build_messy_json(iter_kaomoji([page])))
+    return {
+        'pages': pages,
+        'contents': [data['content'] for data in messy.values()],
+        'messy': messy,
+        'tagged': auto_tag_many(messy),
+        'html_bytes': sum(len(page.encode('utf-8')) for page in pages),
+    }
+
+
+def run_benchmarks(corpus, stages, repeat):
+    """Best-of-`repeat` wall time per stage"""
+    results = {}
+    for name in stages:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            items = STAGES[name](corpus)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = {
+            'seconds': best,
+            'items': items,
+            'us_per_item': best / items * 1e6 if items else None,
+        }
+        print(f"  {name:<14} {best * 1000:10.2f} ms  {items:7d} items"
+              + (f"  {results[name]['us_per_item']:9.1f} us/item" if items else ''))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change per stage; return the stages slower than threshold x baseline"""
+    regressions = []
+    print(f"\nCompared to baseline (Python {baseline['python']}, {baseline['config']['count']} kaomojis):")
+    for name, result in results.items():
+        before = baseline['stages'].get(name)
+        if not before:
+            print(f"  {name:<14} (not in baseline)")
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        marker = '  REGRESSION' if ratio > threshold else ''
+        print(f"  {name:<14} {before['seconds'] * 1000:10.2f} ms -> {result['seconds'] * 1000:10.2f} ms  x{ratio:.2f}{marker}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the kaomoji pipeline on synthetic corpora')
+    parser.add_argument('-n', '--count', type=int, default=2000, help='Number of kaomoji to generate')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Content mix as kind=weight pairs (default: {DEFAULT_MIX})')
+    parser.add_argument('--per-page', type=int, default=100, help='Kaomoji per synthetic HTML page')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the corpus')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs per stage; the fastest is kept')
+    parser.add_argument('--stage', action='append', choices=list(STAGES),
+                        help='Only run this stage (repeatable)')
+    parser.add_argument('-o', '--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare against a saved results file')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f'Slowdown ratio reported as a regression (default: {REGRESSION_THRESHOLD})')
+    args = parser.parse_args()
+
+    config = {
+        'count': args.count,
+        'mix': args.mix,
+        'per_page': args.per_page,
+        'seed': args.seed,
+        'repeat': args.repeat,
+    }
+    print(f"Generating {args.count} kaomojis ({', '.join(f'{k} {v:.0%}' for k, v in args.mix.items())})...")
+    with fixed_keywords():
+        corpus = build_corpus(args.count, args.mix, args.seed, args.per_page)
+        print(f"  {len(corpus['pages'])} HTML pages, {corpus['html_bytes']} bytes, {len(corpus['messy'])} unique kaomojis\n")
+        results = run_benchmarks(corpus, args.stage or list(STAGES), args.repeat)
+    report = {
+        'version': BASELINE_VERSION,
+        'config': config,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'stages': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('version') != BASELINE_VERSION:
+            print(f"Error: {args.compare} is not a version {BASELINE_VERSION} results file")
+            sys.exit(2)
+        if baseline['config'] != config:
+            print("Warning: baseline was recorded with a different corpus configuration")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+'''
+Kaomoji Content Classifier
+Computes the dotArt / hasEmoji / multiLine flags in one pass per string
+'''
+from collections import namedtuple
+
+from .emoji_index import load_emoji_index
+
+# Dot art characters from design doc
+DOT_ART_CHARS = set("⠀⠁⠂⠃⠄⠅⠆⠇⠈⠉⠊⠋⠌⠍⠎⠏⠐⠑⠒⠓⠔⠕⠖⠗⠘⠙⠚⠛⠜⠝⠞⠟⠠⠡⠢⠣⠤⠥⠦⠧⠨⠩⠪⠫⠬⠭⠮⠯⠰⠱⠲⠳⠴⠵⠶⠷⠸⠹⠺⠻⠼⠽⠾⠿⡀⡁⡂⡃⡄⡅⡆⡇⡈⡉⡊⡋⡌⡍⡎⡏⡐⡑⡒⡓⡔⡕⡖⡗⡘⡙⡚⡛⡜⡝⡞⡟⡠⡡⡢⡣⡤⡥⡦⡧⡨⡩⡪⡫⡬⡭⡮⡯⡰⡱⡲⡳⡴⡵⡶⡷⡸⡹⡺⡻⡼⡽⡾⡿⢀⢁⢂⢃⢄⢅⢆⢇⢈⢉⢊⢋⢌⢍⢎⢏⢐⢑⢒⢓⢔⢕⢖⢗⢘⢙⢚⢛⢜⢝⢞⢟⢠⢡⢢⢣⢤⢥⢦⢧⢨⢩⢪⢫⢬⢭⢮⢯⢰⢱⢲⢳⢴⢵⢶⢷⢸⢹⢺⢻⢼⢽⢾⢿⣀⣁⣂⣃⣄⣅⣆⣇⣈⣉⣊⣋⣌⣍⣎⣏⣐⣑⣒⣓⣔⣕⣖⣗⣘⣙⣚⣛⣜⣝⣞⣟⣠⣡⣢⣣⣤⣥⣦⣧⣨⣩⣪⣫⣬⣭⣮⣯⣰⣱⣲⣳⣴⣵⣶⣷⣸⣹⣺⣻⣼⣽⣾⣿")
+
+# Unicode line and paragraph separators
+LINE_BREAKS = '\n\r\u000B\u000C\u0085\u2028\u2029'
+
+# Every character str.isspace() accepts (none lie above U+3000)
+WHITESPACE_CHARS = ''.join(chr(cp) for cp in range(0x3001) if chr(cp).isspace())
+
+DOT_ART_RATIO = 0.7
+
+# Separator for batch classification; never produced by the scraper
+BATCH_SEPARATOR = '\x00'
+
+Classification = namedtuple('Classification', ['dotArt', 'hasEmoji', 'multiLine'])
+
+# Translation table that deletes dot art and whitespace and folds every line
+# break to '\n'. What survives is the "residual" that the emoji and line break
+# checks run on, which for braille art is only a handful of characters.
+_DOT_TABLE = {ord(char): None for char in DOT_ART_CHARS | set(WHITESPACE_CHARS)}
+_DOT_TABLE.update({ord(char): '\n' for char in LINE_BREAKS})
+
+
+def _classify_residual(length, residual):
+    line_breaks = residual.count('\n')
+    non_dot_count = len(residual) - line_breaks
+    return Classification(
+        dotArt=(length - non_dot_count) / length > DOT_ART_RATIO,
+        hasEmoji=load_emoji_index().has_emoji(residual),
+        multiLine=line_breaks > 0,
+    )
+
+
+def classify(content):
+    """Return the dotArt, hasEmoji and multiLine flags for one kaomoji"""
+    if not content:
+        return Classification(False, False, False)
+    return _classify_residual(len(content), content.translate(_DOT_TABLE))
+
+
+def classify_many(contents):
+    """Classify a sequence of contents with a single translate over all of them"""
+    contents = list(contents)
+    if any(BATCH_SEPARATOR in content for content in contents):
+        return [classify(content) for content in contents]
+
+    residuals = BATCH_SEPARATOR.join(contents).translate(_DOT_TABLE).split(BATCH_SEPARATOR)
+    return [
+        _classify_residual(len(content), residual) if content else Classification(False, False, False)
+        for content, residual in zip(contents, residuals)
+    ]
+
@@ -0,0 +1,65 @@
+'''
+Kaomonger
+One command for every kaomoji tool: `kaomonger <command> [options]`
+
+Each subcommand imports only the module implementing it, so searching or
+extracting from a saved page never loads the HTTP stack or the review
+machinery. The keyword lists and emoji data ship with the package; cleaned/,
+dirty_json/ and the caches are found through kaomonger.workspace, so the
+commands work from any directory.
+'''
+import importlib
+import sys
+
+from . import WorkspaceError
+
+# command -> (module, entry point, summary)
+COMMANDS = {
+    'scrape': ('scrape_to_messy_json', 'main', 'Download category pages into dirty_json/'),
+    'extract': ('scrape_to_messy_json', 'extract_main', 'Extract kaomoji from saved HTML pages into dirty_json/'),
+    'pretag': ('pretag', 'main', 'Auto-tag the dirty files ahead of review'),
+    'clean': ('messy_to_clean', 'main', 'Review dirty kaomoji into cleaned/'),
+    'queue': ('work_queue', 'main', 'Show the state of the cleaning work queue'),
+    'search': ('search_index', 'main', 'Print cleaned kaomoji as TSV, filtered by flags and tags'),
+    'rank': ('tag_search', 'main', 'Rank cleaned kaomoji by typo-tolerant tag relevance'),
+    'preview': ('preview', 'main', 'Print the bounded preview of a cleaned kaomoji'),
+    'daemon': ('search_daemon', 'main', 'Serve searches over a Unix socket'),
+    'compact': ('compact_corpus', 'main', 'Merge cleaned shards into the canonical store'),
+    'export': ('corpus_export', 'main', 'Write the memory-mapped export of the canonical store'),
+    'reclassify': ('reclassify', 'main', 'Update hasEmoji/species/emotion after rule changes'),
+    'bench': ('benchmark', 'main', 'Benchmark the pipeline on synthetic data'),
+}
+
+
+def usage():
+    width = max(len(command) for command in COMMANDS)
+    lines = ["usage: kaomonger <command> [options]", "", "commands:"]
+    lines += [f"  {command:<{width}}  {summary}" for command, (_, _, summary) in COMMANDS.items()]
+    lines += ["", "Run 'kaomonger <command> -h' for the options of a command."]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        sys.exit(0 if argv else 2)
+
+    command = argv[0]
+    if command not in COMMANDS:
+        print(f"kaomonger: unknown command '{command}'\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+
+    module_name, entry_point, _ = COMMANDS[command]
+    # The subcommand parses sys.argv itself and names itself in its usage line
+    sys.argv = [f"kaomonger {command}", *argv[1:]]
+    try:
+        module = importlib.import_module(f'.{module_name}', __package__)
+    except WorkspaceError as e:
+        print(f"kaomonger: {e}", file=sys.stderr)
+        sys.exit(2)
+    getattr(module, entry_point)()
+
+
+if __name__ == '__main__':
+    main()
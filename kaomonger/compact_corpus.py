@@ -0,0 +1,138 @@
+'''
+Corpus Compaction
+Merges the timestamped cleaned/cleaned_kaomoji_*.json shards into one
+deduplicated canonical store with a manifest of the shards it contains
+
+Merge rules, applied in shard (timestamp) order:
+  - content, dotArt, hasEmoji, multiLine: the most recent shard wins
+  - species, emotion, misc: union, first spelling of a tag kept, order preserved
+'''
+import argparse
+import json
+import os
+from pathlib import Path
+
+from .workspace import CLEANED_DIR, ROOT_DIR
+
+CANONICAL_DIR = ROOT_DIR / 'canonical'
+
+STORE_NAME = 'kaomoji.json'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+TAG_FIELDS = ('species', 'emotion', 'misc')
+
+
+def merge_tags(existing, incoming):
+    """Ordered union of two tag lists, matching case-insensitively"""
+    merged = list(existing)
+    seen = {tag.casefold() for tag in merged}
+    for tag in incoming:
+        if tag.casefold() not in seen:
+            seen.add(tag.casefold())
+            merged.append(tag)
+    return merged
+
+
+def merge_entry(existing, incoming):
+    """Merge a newer shard's entry into the canonical one"""
+    if existing is None:
+        return dict(incoming)
+    merged = dict(existing)
+    for key, value in incoming.items():
+        if key in TAG_FIELDS:
+            merged[key] = merge_tags(existing.get(key, []), value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def shard_stamp(path):
+    stat = path.stat()
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def write_json_atomic(path, data, indent=2):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_canonical(output_dir=CANONICAL_DIR):
+    """Return (store, manifest) for an existing canonical store, or empty ones"""
+    output_dir = Path(output_dir)
+    try:
+        with open(output_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        with open(output_dir / STORE_NAME, 'r', encoding='utf-8') as f:
+            store = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}, {'version': MANIFEST_VERSION, 'shards': {}}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}, {'version': MANIFEST_VERSION, 'shards': {}}
+    return store, manifest
+
+
+def compact(cleaned_dir=CLEANED_DIR, output_dir=CANONICAL_DIR, full=False):
+    """Fold new shards into the canonical store
+
+    Only shards missing from the manifest are read. If a shard already in the
+    manifest was modified or removed, its old contribution cannot be undone
+    from merged tag lists, so the store is rebuilt from every shard.
+
+    Returns:
+        Tuple of (number of shards read, number of entries in the store)
+    """
+    cleaned_dir = Path(cleaned_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+
+    shards = {path.name: path for path in sorted(cleaned_dir.glob('cleaned_kaomoji_*.json'))}
+    store, manifest = ({}, {'version': MANIFEST_VERSION, 'shards': {}}) if full else load_canonical(output_dir)
+
+    recorded = manifest['shards']
+    for name, stamp in recorded.items():
+        path = shards.get(name)
+        if path is None or shard_stamp(path) != {key: stamp[key] for key in ('mtime_ns', 'size')}:
+            print(f"Shard {name} changed since last compaction, rebuilding")
+            store, recorded = {}, {}
+            break
+
+    new_shards = [name for name in shards if name not in recorded]
+    if not new_shards:
+        return 0, len(store)
+
+    for name in new_shards:
+        path = shards[name]
+        stamp = shard_stamp(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            shard = json.load(f)
+        for emoji_id, entry in shard.items():
+            store[emoji_id] = merge_entry(store.get(emoji_id), entry)
+        recorded[name] = dict(stamp, entries=len(shard))
+
+    manifest = {'version': MANIFEST_VERSION, 'shards': dict(sorted(recorded.items()))}
+    write_json_atomic(output_dir / STORE_NAME, store)
+    write_json_atomic(output_dir / MANIFEST_NAME, manifest)
+    return len(new_shards), len(store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge cleaned shards into one deduplicated canonical store')
+    parser.add_argument('--cleaned', default=str(CLEANED_DIR), help='Directory of cleaned shards')
+    parser.add_argument('--output', default=str(CANONICAL_DIR), help='Directory for the canonical store')
+    parser.add_argument('--full', action='store_true', help='Ignore the manifest and rebuild from every shard')
+    args = parser.parse_args()
+
+    shard_count, entry_count = compact(args.cleaned, args.output, args.full)
+    if shard_count:
+        print(f"Merged {shard_count} shards; canonical store holds {entry_count} kaomojis")
+    else:
+        print(f"Canonical store is up to date ({entry_count} kaomojis)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+'''
+Binary Corpus Export
+Writes the canonical kaomoji store as one memory-mappable columnar file and
+reads entries back without parsing the whole corpus
+
+Layout (native byte order, sections 8-byte aligned):
+  header       magic, format version, entry count, tag count, section table
+  ids          sorted emoji_ids as a string table (offsets + blob)
+  flags        one byte per entry, dotArt/hasEmoji/multiLine bits
+  tag names    interned tag dictionary as a string table
+  tag lists    per entry and tag kind, offsets into an array of tag numbers
+  content      every content string in one UTF-8 blob with an offsets array
+
+Opening a file only reads the header, so the cost does not grow with the
+size of the corpus; a lookup is a binary search over the id table.
+'''
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from .compact_corpus import CANONICAL_DIR, CLEANED_DIR, TAG_FIELDS, compact, load_canonical
+from .search_index import FLAG_BITS, entry_flags
+
+EXPORT_NAME = 'kaomoji.bin'
+MAGIC = b'KAOC'
+FORMAT_VERSION = 1
+
+# Section name to array typecode ('B' for raw UTF-8 bytes)
+SECTIONS = (
+    ('id_offsets', 'Q'),
+    ('id_blob', 'B'),
+    ('flags', 'B'),
+    ('tag_offsets', 'Q'),
+    ('tag_blob', 'B'),
+    ('tag_list_offsets', 'I'),
+    ('tag_numbers', 'I'),
+    ('content_offsets', 'Q'),
+    ('content_blob', 'B'),
+)
+
+_HEADER = struct.Struct('=4sIII')
+_SECTION_ENTRY = struct.Struct('=QQ')
+_ALIGNMENT = 8
+
+
+def _string_table(strings):
+    """Offsets array (n + 1 entries) and concatenated UTF-8 blob"""
+    offsets = array('Q', [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode('utf-8')
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+def build_sections(store):
+    """Columnar sections for a canonical store (emoji_id to entry)"""
+    ids = sorted(store)
+    tag_numbers_by_name = {}
+    tag_list_offsets = array('I', [0])
+    tag_numbers = array('I')
+    flags = bytearray()
+    contents = []
+    for emoji_id in ids:
+        entry = store[emoji_id]
+        flags.append(entry_flags(entry))
+        contents.append(entry.get('content', ''))
+        for kind in TAG_FIELDS:
+            for tag in entry.get(kind, []):
+                tag_numbers.append(tag_numbers_by_name.setdefault(tag, len(tag_numbers_by_name)))
+            tag_list_offsets.append(len(tag_numbers))
+
+    id_offsets, id_blob = _string_table(ids)
+    tag_offsets, tag_blob = _string_table(tag_numbers_by_name)
+    content_offsets, content_blob = _string_table(contents)
+    sections = {
+        'id_offsets': id_offsets,
+        'id_blob': id_blob,
+        'flags': bytes(flags),
+        'tag_offsets': tag_offsets,
+        'tag_blob': tag_blob,
+        'tag_list_offsets': tag_list_offsets,
+        'tag_numbers': tag_numbers,
+        'content_offsets': content_offsets,
+        'content_blob': content_blob,
+    }
+    return len(ids), len(tag_numbers_by_name), sections
+
+
+def write_export(store, path):
+    """Write a canonical store to a binary export file (atomically)"""
+    path = Path(path)
+    count, tag_count, sections = build_sections(store)
+
+    offset = _HEADER.size + _SECTION_ENTRY.size * len(SECTIONS)
+    table = []
+    payloads = []
+    for name, _ in SECTIONS:
+        data = sections[name]
+        data = data.tobytes() if isinstance(data, array) else data
+        padding = -offset % _ALIGNMENT
+        offset += padding
+        table.append((offset, len(data)))
+        payloads.append(b'\0' * padding + data)
+        offset += len(data)
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, count, tag_count))
+        for entry in table:
+            f.write(_SECTION_ENTRY.pack(*entry))
+        for payload in payloads:
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+class _StringTable:
+    """Sequence view over an offsets array and a UTF-8 blob"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def view(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        return bytes(self.view(i))
+
+    def text(self, i):
+        return str(self.view(i), 'utf-8')
+
+
+class CorpusReader:
+    """Memory-mapped access to a binary export
+
+    Views handed out by `content_bytes` point into the mapping and must be
+    released before the reader is closed.
+    """
+
+    def __init__(self, path=CANONICAL_DIR / EXPORT_NAME):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = [memoryview(self._map)]
+        buffer = self._views[0]
+
+        magic, version, self.count, self.tag_count = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} kaomoji export")
+
+        sections = {}
+        for i, (name, typecode) in enumerate(SECTIONS):
+            offset, length = _SECTION_ENTRY.unpack_from(buffer, _HEADER.size + i * _SECTION_ENTRY.size)
+            view = buffer[offset:offset + length]
+            self._views.append(view)
+            if typecode != 'B':
+                view = view.cast(typecode)
+                self._views.append(view)
+            sections[name] = view
+
+        self._ids = _StringTable(sections['id_offsets'], sections['id_blob'])
+        self._tags = _StringTable(sections['tag_offsets'], sections['tag_blob'])
+        self._contents = _StringTable(sections['content_offsets'], sections['content_blob'])
+        self._flags = sections['flags']
+        self._tag_list_offsets = sections['tag_list_offsets']
+        self._tag_numbers = sections['tag_numbers']
+
+    def __len__(self):
+        return self.count
+
+    def index_of(self, emoji_id):
+        """Position of an emoji_id in the export, or None"""
+        key = emoji_id.encode('utf-8')
+        i = bisect_left(self._ids, key)
+        if i < self.count and self._ids[i] == key:
+            return i
+        return None
+
+    def __contains__(self, emoji_id):
+        return self.index_of(emoji_id) is not None
+
+    def ids(self):
+        return (self._ids.text(i) for i in range(self.count))
+
+    def content_bytes(self, emoji_id):
+        """UTF-8 content as a zero-copy view into the mapping"""
+        i = self.index_of(emoji_id)
+        return None if i is None else self._contents.view(i)
+
+    def content(self, emoji_id):
+        i = self.index_of(emoji_id)
+        return None if i is None else self._contents.text(i)
+
+    def flags(self, emoji_id):
+        """Mapping of flag name to bool"""
+        i = self.index_of(emoji_id)
+        if i is None:
+            return None
+        bits = self._flags[i]
+        return {name: bool(bits & bit) for name, bit in FLAG_BITS.items()}
+
+    def tags(self, emoji_id, kind):
+        i = self.index_of(emoji_id)
+        if i is None:
+            return None
+        return self._tag_list(i, TAG_FIELDS.index(kind))
+
+    def _tag_list(self, i, kind_number):
+        slot = i * len(TAG_FIELDS) + kind_number
+        start, end = self._tag_list_offsets[slot], self._tag_list_offsets[slot + 1]
+        return [self._tags.text(number) for number in self._tag_numbers[start:end]]
+
+    def entry(self, emoji_id):
+        """The entry in the same shape as the cleaned JSON, or None"""
+        i = self.index_of(emoji_id)
+        if i is None:
+            return None
+        entry = {'content': self._contents.text(i)}
+        for kind_number, kind in enumerate(TAG_FIELDS):
+            entry[kind] = self._tag_list(i, kind_number)
+        bits = self._flags[i]
+        entry.update((name, bool(bits & bit)) for name, bit in FLAG_BITS.items())
+        return entry
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the cleaned corpus to a memory-mappable binary file')
+    parser.add_argument('--cleaned', default=str(CLEANED_DIR), help='Directory of cleaned shards')
+    parser.add_argument('--output', default=str(CANONICAL_DIR), help='Directory for the canonical store and export')
+    parser.add_argument('--get', metavar='EMOJI_ID', help='Print one entry from an existing export and exit')
+    args = parser.parse_args()
+
+    export_path = Path(args.output) / EXPORT_NAME
+    if args.get:
+        with CorpusReader(export_path) as reader:
+            entry = reader.entry(args.get)
+        if entry is None:
+            print(f"Error: {args.get} is not in {export_path}", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(entry, indent=2, ensure_ascii=False))
+        return
+
+    compact(args.cleaned, args.output)
+    store, _ = load_canonical(args.output)
+    count = write_export(store, export_path)
+    print(f"Exported {count} kaomojis to {export_path} ({export_path.stat().st_size} bytes)")
+
+
+if __name__ == '__main__':
+    main()
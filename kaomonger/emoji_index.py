@@ -0,0 +1,187 @@
+'''
+Emoji Index
+Precompiled emoji matcher built from emoji_data.txt: sorted code point
+intervals for single-character emoji plus a trie for multi-code-point
+sequences (keycaps, flags, ZWJ sequences)
+
+emoji_data.txt lists sequences in one qualification only (keycaps as
+"0023 20E3"), while text usually carries an emoji presentation selector
+(U+FE0F) after the base character, so the matcher accepts an optional
+U+FE0F between the elements of every sequence.
+'''
+import marshal
+import re
+from bisect import bisect_right
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent
+EMOJI_DATA_PATH = DATA_DIR / 'emoji_data.txt'
+INDEX_PATH = DATA_DIR / 'emoji_index.bin'
+
+# Bump when the artifact layout changes so stale files are rebuilt
+INDEX_FORMAT = 1
+
+# Trie key marking the end of a complete sequence (never a real code point)
+SEQUENCE_END = -1
+
+# Emoji presentation selector, optional inside a sequence
+VARIATION_SELECTOR_16 = 0xFE0F
+
+_loaded_index = None
+
+
+class EmojiIndex:
+    """Emoji code point intervals and sequence trie"""
+
+    def __init__(self, starts, ends, sequences):
+        self.starts = starts
+        self.ends = ends
+        self.sequences = sequences
+        self._pattern = None
+
+    def is_emoji_codepoint(self, code_point):
+        """True if the code point is an emoji on its own"""
+        i = bisect_right(self.starts, code_point) - 1
+        return i >= 0 and code_point <= self.ends[i]
+
+    def pattern_source(self):
+        """Regex source matching any sequence, then any single emoji"""
+        alternatives = []
+        if self.sequences:
+            alternatives.append(_trie_regex(self.sequences))
+        if self.starts:
+            alternatives.append('[' + ''.join(
+                _escape(start) if start == end else f'{_escape(start)}-{_escape(end)}'
+                for start, end in zip(self.starts, self.ends)
+            ) + ']')
+        # An index with no entries must never match
+        return '|'.join(alternatives) or '(?!)'
+
+    def pattern(self):
+        """Compiled pattern; sequences are tried before single code points"""
+        if self._pattern is None:
+            self._pattern = re.compile(self.pattern_source())
+        return self._pattern
+
+    def has_emoji(self, content):
+        return self.pattern().search(content) is not None
+
+
+def _escape(code_point):
+    return re.escape(chr(code_point))
+
+
+def _trie_regex(node):
+    """Turn a sequence trie into a regex with shared prefixes factored out"""
+    branches = [
+        _escape(code_point) + _selector(code_point, child) + _trie_regex(child)
+        for code_point, child in sorted(node.items())
+        if code_point != SEQUENCE_END
+    ]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if SEQUENCE_END in node:
+        body = f'(?:{body})?'
+    return body
+
+
+def _selector(code_point, child):
+    """Optional U+FE0F after a sequence element that is not the last one"""
+    if code_point == VARIATION_SELECTOR_16 or not child.keys() - {SEQUENCE_END}:
+        return ''
+    return _escape(VARIATION_SELECTOR_16) + '?'
+
+
+def _merge_intervals(code_points):
+    starts, ends = [], []
+    for code_point in sorted(code_points):
+        if ends and code_point == ends[-1] + 1:
+            ends[-1] = code_point
+        else:
+            starts.append(code_point)
+            ends.append(code_point)
+    return starts, ends
+
+
+def parse_emoji_data(path=EMOJI_DATA_PATH):
+    """Parse emoji_data.txt into single code points and a sequence trie"""
+    singles = set()
+    sequences = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            # Code point(s) are the first field before the semicolon
+            code_point_str = line.split('#', 1)[0].split(';', 1)[0].strip()
+            if not code_point_str:
+                continue
+            try:
+                code_points = [int(cp, 16) for cp in code_point_str.split()]
+            except ValueError:
+                continue
+            if len(code_points) == 1:
+                singles.add(code_points[0])
+                continue
+            node = sequences
+            for code_point in code_points:
+                node = node.setdefault(code_point, {})
+            node[SEQUENCE_END] = {}
+    starts, ends = _merge_intervals(singles)
+    return EmojiIndex(starts, ends, sequences)
+
+
+def fallback_index():
+    """Fallback emoji ranges if emoji_data.txt is not available"""
+    ranges = [(0x1F600, 0x1F64F), (0x1F300, 0x1F5FF), (0x1F680, 0x1F6FF),
+              (0x1F1E6, 0x1F1FF), (0x2600, 0x26FF), (0x2700, 0x27BF),
+              (0xFE00, 0xFE0F)]
+    starts, ends = _merge_intervals(cp for start, end in ranges for cp in range(start, end + 1))
+    return EmojiIndex(starts, ends, {})
+
+
+def _source_stamp(path):
+    stat = path.stat()
+    return (INDEX_FORMAT, stat.st_mtime_ns, stat.st_size)
+
+
+def build_emoji_index(source=EMOJI_DATA_PATH, index_path=INDEX_PATH):
+    """Parse emoji_data.txt and save the compact index artifact next to it"""
+    source = Path(source)
+    index = parse_emoji_data(source)
+    payload = (_source_stamp(source), index.starts, index.ends, index.sequences)
+    try:
+        Path(index_path).write_bytes(marshal.dumps(payload))
+    except OSError:
+        # Read-only install; the index still works, it just is not cached
+        pass
+    return index
+
+
+def load_emoji_index(source=EMOJI_DATA_PATH, index_path=INDEX_PATH):
+    """Load the emoji index, rebuilding the artifact if emoji_data.txt changed"""
+    global _loaded_index
+    if _loaded_index is not None:
+        return _loaded_index
+
+    source = Path(source)
+    try:
+        stamp = _source_stamp(source)
+    except FileNotFoundError:
+        print("Warning: emoji_data.txt not found, using fallback ranges")
+        _loaded_index = fallback_index()
+        return _loaded_index
+
+    try:
+        saved_stamp, starts, ends, sequences = marshal.loads(Path(index_path).read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        saved_stamp = None
+    if saved_stamp == stamp:
+        _loaded_index = EmojiIndex(list(starts), list(ends), sequences)
+    else:
+        _loaded_index = build_emoji_index(source, index_path)
+    return _loaded_index
+
+
+if __name__ == '__main__':
+    index = build_emoji_index()
+    print(f"Built {INDEX_PATH.name}: {len(index.starts)} intervals, "
+          f"{len(index.sequences)} sequence prefixes")
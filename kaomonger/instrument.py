@@ -0,0 +1,185 @@
+'''
+Run Instrumentation
+Counters and per-stage timings for scrape and clean runs, written out as a
+JSON report, with an optional live progress line on stderr that ends in a
+per-stage summary
+
+Stages are timed where the work happens (download, extract, classify, tag,
+review_wait, write); when stages run in several threads their times add up,
+so a stage can account for more seconds than the wall clock.
+'''
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+REPORT_VERSION = 1
+PROGRESS_INTERVAL = 0.2
+
+
+class ProgressLine:
+    """Single status line rewritten in place"""
+
+    def __init__(self, total, label, stream=sys.stderr):
+        self.total = total
+        self.label = label
+        self.stream = stream
+        self.started = time.perf_counter()
+        self._last_draw = 0.0
+
+    def update(self, done, stage='', force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_draw < PROGRESS_INTERVAL:
+            return
+        self._last_draw = now
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed else 0.0
+        percent = f" {done / self.total:6.1%}" if self.total else ''
+        self.stream.write(f"\r\033[K[{done}/{self.total}]{percent} {rate:.1f} {self.label}/s {stage}")
+        self.stream.flush()
+
+    def finish(self, done):
+        self.update(done, force=True)
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class Stats:
+    """Thread-safe counters, stage timings and file I/O for one run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.perf_counter()
+            self.counters = defaultdict(int)
+            self.stages = defaultdict(lambda: {'calls': 0, 'seconds': 0.0})
+            self.file_reads = defaultdict(int)
+            self.bytes_read = 0
+            self.bytes_written = 0
+            self.progress = None
+            self.done = 0
+            self._current_stage = ''
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def add_time(self, stage, seconds, calls=1):
+        with self._lock:
+            self.stages[stage]['calls'] += calls
+            self.stages[stage]['seconds'] += seconds
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one call of a stage"""
+        self._current_stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def timed(self, name, iterable):
+        """Yield from iterable, timing only the work of producing each item"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start, calls=0)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def read_file(self, path, size):
+        with self._lock:
+            self.file_reads[str(path)] += 1
+            self.bytes_read += size
+
+    def wrote_file(self, size):
+        with self._lock:
+            self.bytes_written += size
+
+    def start_progress(self, total, label):
+        self.progress = ProgressLine(total, label)
+        self.done = 0
+
+    def advance(self, n=1):
+        self.done += n
+        if self.progress:
+            self.progress.update(self.done, self._current_stage)
+
+    def finish_progress(self):
+        """End the progress line with the per-stage timings of the run"""
+        if self.progress:
+            self.progress.finish(self.done)
+            self.print_summary(self.progress.stream)
+            self.progress = None
+
+    def snapshot(self):
+        """Picklable state for merging the stats of a worker process"""
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'stages': {name: dict(stage) for name, stage in self.stages.items()},
+                'file_reads': dict(self.file_reads),
+                'bytes_read': self.bytes_read,
+                'bytes_written': self.bytes_written,
+            }
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, n in snapshot['counters'].items():
+                self.counters[name] += n
+            for name, stage in snapshot['stages'].items():
+                self.stages[name]['calls'] += stage['calls']
+                self.stages[name]['seconds'] += stage['seconds']
+            for path, n in snapshot['file_reads'].items():
+                self.file_reads[path] += n
+            self.bytes_read += snapshot['bytes_read']
+            self.bytes_written += snapshot['bytes_written']
+
+    def report(self):
+        """The run as a JSON-serializable dict"""
+        wall = time.perf_counter() - self.started
+        with self._lock:
+            rereads = sum(n - 1 for n in self.file_reads.values() if n > 1)
+            entries = self.counters.get('entries', 0)
+            return {
+                'version': REPORT_VERSION,
+                'wall_seconds': round(wall, 6),
+                'stages': {
+                    name: {
+                        'calls': stage['calls'],
+                        'seconds': round(stage['seconds'], 6),
+                        'share_of_wall': round(stage['seconds'] / wall, 4) if wall else None,
+                    }
+                    for name, stage in sorted(self.stages.items(), key=lambda item: -item[1]['seconds'])
+                },
+                'counters': dict(sorted(self.counters.items())),
+                'bytes_read': self.bytes_read,
+                'bytes_written': self.bytes_written,
+                'files_read': len(self.file_reads),
+                'file_rereads': rereads,
+                'file_rereads_per_entry': round(rereads / entries, 4) if entries else None,
+            }
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_summary(self, stream=sys.stderr):
+        report = self.report()
+        stream.write(f"Wall time: {report['wall_seconds']:.2f}s\n")
+        for name, stage in report['stages'].items():
+            stream.write(f"  {name:<12} {stage['seconds']:9.3f}s  {stage['calls']:6d} calls\n")
+
+
+# Shared by every module of a run; worker processes merge theirs back via snapshot()
+STATS = Stats()
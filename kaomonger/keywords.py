@@ -0,0 +1,158 @@
+'''
+Keyword Registry
+Keeps species.txt / emotions.txt in memory for auto-tagging and review
+
+File format is one tag per line, '#' comments allowed. A line of the form
+"canonical = alias, other alias" also registers synonyms that auto-tag to
+the canonical tag.
+'''
+import os
+from pathlib import Path
+
+from .workspace import keyword_dir
+
+ALIAS_SEPARATOR = ' = '
+
+_NOT_LOADED = object()
+
+
+def fold(tag):
+    """Normalize a tag for case-insensitive matching"""
+    return tag.strip().casefold()
+
+
+class KeywordList:
+    """One keyword file, reloaded only when its mtime or size changes"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tags = {}      # folded tag -> canonical spelling
+        self.aliases = {}   # folded alias -> canonical spelling
+        self._pending = []
+        self._file_keys = set()  # folded tags and aliases written in the file
+        self._stamp = _NOT_LOADED
+
+    def _current_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        """Reload the file if it was edited outside this process"""
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return
+        self._load()
+        self._stamp = stamp
+
+    def _load(self):
+        self.tags = {}
+        self.aliases = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#'):  # Skip empty lines and comments
+                        continue
+                    canonical, _, alias_str = line.partition(ALIAS_SEPARATOR)
+                    canonical = canonical.strip()
+                    self.tags[fold(canonical)] = canonical
+                    for alias in alias_str.split(','):
+                        if alias.strip():
+                            self.aliases[fold(alias)] = canonical
+        except FileNotFoundError:
+            print(f"Warning: {self.path.name} not found, using empty keyword set")
+        self._file_keys = self.tags.keys() | self.aliases.keys()
+        # Tags queued but not yet written are still known
+        for tag in self._pending:
+            self.tags.setdefault(fold(tag), tag)
+
+    def lookup(self, tag):
+        """Canonical tag for a tag or alias, or None if unknown"""
+        self.refresh()
+        key = fold(tag)
+        return self.tags.get(key) or self.aliases.get(key)
+
+    def __contains__(self, tag):
+        return self.lookup(tag) is not None
+
+    def match(self, tags):
+        """Canonical keywords found among the given tags, in order, without repeats"""
+        self.refresh()
+        matched = []
+        for tag in tags:
+            key = fold(tag)
+            canonical = self.tags.get(key) or self.aliases.get(key)
+            if canonical is not None and canonical not in matched:
+                matched.append(canonical)
+        return matched
+
+    def mapping(self):
+        """Folded tag or alias -> canonical tag, exactly as match() resolves them"""
+        self.refresh()
+        return {**self.aliases, **self.tags}
+
+    def sorted_tags(self):
+        self.refresh()
+        return sorted(self.tags.values(), key=fold)
+
+    def add(self, tags):
+        """Queue unknown tags for appending; returns the ones that were new"""
+        new_tags = []
+        for tag in tags:
+            if tag.strip() and self.lookup(tag) is None:
+                self.tags[fold(tag)] = tag
+                self._pending.append(tag)
+                new_tags.append(tag)
+        return new_tags
+
+    def flush(self):
+        """Append queued tags to the file in one write
+
+        Tags that were written to the file by someone else in the meantime are
+        not appended again.
+        """
+        if not self._pending:
+            return []
+        self.refresh()
+        written = [tag for tag in self._pending if fold(tag) not in self._file_keys]
+        self._pending = []
+        if not written:
+            return []
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"\n{tag}" for tag in written))
+        self._file_keys.update(fold(tag) for tag in written)
+        # Our own append is not an external edit
+        self._stamp = self._current_stamp()
+        return written
+
+
+class KeywordRegistry:
+    """Species and emotion keyword lists shared by auto-tagging and review"""
+
+    def __init__(self, data_dir=None):
+        # Default: the workspace's lists, see kaomonger.workspace
+        data_dir = keyword_dir() if data_dir is None else Path(data_dir)
+        self.species = KeywordList(data_dir / 'species.txt')
+        self.emotions = KeywordList(data_dir / 'emotions.txt')
+
+    def auto_tag_species(self, misc_tags):
+        return self.species.match(misc_tags)
+
+    def auto_tag_emotion(self, misc_tags):
+        return self.emotions.match(misc_tags)
+
+    def add(self, species_tags, emotion_tags):
+        """Queue any new species/emotion tags for the keyword files"""
+        return self.species.add(species_tags), self.emotions.add(emotion_tags)
+
+    def flush(self):
+        """Write queued tags through to species.txt and emotions.txt"""
+        new_species = self.species.flush()
+        if new_species:
+            print(f"Added new species to species.txt: {', '.join(new_species)}")
+        new_emotions = self.emotions.flush()
+        if new_emotions:
+            print(f"Added new emotions to emotions.txt: {', '.join(new_emotions)}")
@@ -0,0 +1,371 @@
+'''
+Kaomoji Processing Script
+Cleans and processes kaomoji data from messy JSON to structured format
+'''
+import json
+import os
+from pathlib import Path
+import tempfile
+import subprocess
+import datetime
+import argparse
+import logging
+
+from .autotag import KEYWORDS, auto_tag_species, auto_tag_emotion, auto_tag_kaomoji
+from .instrument import STATS
+from .seen_index import SeenIndex
+from .compact_corpus import CLEANED_DIR, compact, load_canonical, merge_tags
+from .near_duplicates import cluster_variants
+from .pretag import DIRTY_DIR, pretag_all, load_pretagged, discard_pretagged, rematch_keywords
+from .preview import cached_preview
+from .review_buffer import (format_record, format_reference, format_suggestions, parse_sections,
+                           apply_sections, review_batch)
+from .work_queue import OPEN_STATES, QUEUE_PATH, WorkQueue
+
+log = logging.getLogger('messy_to_clean')
+
+def process_kaomoji(kaomoji_id, kaomoji_data, variant_count=0, pretagged=None):
+    """Process a single kaomoji entry"""
+    processed = rematch_keywords(pretagged) if pretagged is not None else auto_tag_kaomoji(kaomoji_data)
+    
+    # Manual verification
+    with STATS.stage('review_wait'):
+        return manual_verify_kaomoji(kaomoji_id, processed, variant_count)
+
+def apply_to_variant(accepted, variant_data):
+    """Give a near-duplicate variant the reviewed tags of its cluster representative"""
+    entry = auto_tag_kaomoji(variant_data)
+    entry['species'] = list(accepted['species'])
+    entry['emotion'] = list(accepted['emotion'])
+    entry['misc'] = merge_tags(accepted['misc'], entry['misc'])
+    return entry
+
+def merge_known_kaomoji(existing, kaomoji_data):
+    """Fold a re-scraped kaomoji's tags into its cleaned entry, or None if nothing is new"""
+    misc = kaomoji_data.get('misc', [])
+    merged = dict(existing)
+    merged['misc'] = merge_tags(existing.get('misc', []), misc)
+    merged['species'] = merge_tags(existing.get('species', []), auto_tag_species(misc))
+    merged['emotion'] = merge_tags(existing.get('emotion', []), auto_tag_emotion(misc))
+    if all(merged[key] == existing.get(key, []) for key in ('misc', 'species', 'emotion')):
+        return None
+    return merged
+
+def manual_verify_kaomoji(kaomoji_id, kaomoji_data, variant_count=0):
+    """Open kaomoji in editor for manual verification and editing"""
+    editor = os.environ.get('EDITOR', 'vim')
+    
+    # Add delete field for manual control
+    kaomoji_data['delete'] = False
+    
+    # Create temporary file with a more editable format
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+        # Write in a format that's easy to edit
+        f.write(f"# Kaomoji ID: {kaomoji_id}\n")
+        if variant_count:
+            f.write(f"# Near-duplicate cluster: keeping or deleting this also applies to {variant_count} variants\n")
+        f.write("# Edit the content below, then save and exit\n")
+        f.write("# Set 'delete': true to skip this kaomoji\n")
+        f.write("# Lines starting with # are comments\n")
+        f.write(format_suggestions(kaomoji_data) + "\n")
+        
+        f.write(format_record(kaomoji_data))
+        
+        # Append current species and emotion lists for reference
+        f.write(format_reference())
+        
+        temp_path = f.name
+    
+    try:
+        print(f"\nEditing kaomoji {kaomoji_id}")
+        if variant_count:
+            print(f"Near-duplicate cluster: decision applies to {variant_count} more variants")
+        print("Content preview:")
+        print("─" * 40)
+        print(cached_preview(kaomoji_id, kaomoji_data['content']))
+        print("─" * 40)
+        print("Instructions:")
+        print("  - Edit fields as needed")
+        print("  - Set 'delete': true to skip this kaomoji")
+        print("  - Press 's' to skip without editing")
+        print("  - Save and exit to continue")
+        
+        response = input("Press Enter to open in editor, or 's' to skip: ")
+        if response.lower() == 's':
+            print("Kaomoji skipped.")
+            return None
+        
+        # Open in editor
+        subprocess.run([editor, temp_path])
+        
+        # Check if file still exists and has content
+        if not os.path.exists(temp_path):
+            print("ERROR: Temporary file was deleted!")
+            return manual_verify_kaomoji(kaomoji_id, kaomoji_data, variant_count)
+            
+        # Parse the edited file
+        with open(temp_path, 'r', encoding='utf-8') as f:
+            file_content = f.read()
+        
+        log.debug("File size: %d bytes", len(file_content))
+        log.debug("First 500 chars:\n%s\n--- End preview ---", file_content[:500])
+        
+        if not file_content.strip():
+            print("ERROR: File is empty!")
+            return manual_verify_kaomoji(kaomoji_id, kaomoji_data, variant_count)
+        
+        # Extract content and metadata
+        sections = parse_sections(file_content)
+        
+        # Debug: log what we're trying to parse
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Parsing sections:")
+            for section_name in ['SPECIES', 'EMOTION', 'MISC', 'METADATA']:
+                log.debug("  %s: '%s'", section_name, sections.get(section_name, 'NOT FOUND'))
+        
+        try:
+            edited_data = apply_sections(kaomoji_data, sections)
+            
+            # Queue any new species and emotion entries for the keyword files
+            KEYWORDS.add(edited_data['species'], edited_data['emotion'])
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}")
+            print("Please fix the format and try again...")
+            input("Press Enter to reopen editor...")
+            subprocess.run([editor, temp_path])
+            # Recursively try again
+            return manual_verify_kaomoji(kaomoji_id, kaomoji_data, variant_count)
+        
+        # Check if marked for deletion
+        if edited_data.get('delete', False):
+            print("Kaomoji marked for deletion, skipping...")
+            return None
+        else:
+            # Remove delete field before returning
+            edited_data.pop('delete', None)
+            print("Changes saved. Continue to next kaomoji...")
+            return edited_data
+        
+    finally:
+        # Clean up temp file
+        os.unlink(temp_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Review messy kaomoji JSON into the cleaned format')
+    parser.add_argument('--compact', action='store_true',
+                        help='Write out sessions left unfinished by an interruption and exit')
+    parser.add_argument('--group-variants', action='store_true',
+                        help='Review near-duplicate variants as one cluster')
+    parser.add_argument('--drop-variants', action='store_true',
+                        help='With --group-variants, save only the reviewed representative of a cluster')
+    parser.add_argument('--no-pretag', action='store_true',
+                        help='Auto-tag inline instead of pre-tagging all dirty files first')
+    parser.add_argument('--batch', type=int, default=1, metavar='N',
+                        help='Review N kaomojis per editor buffer (default: 1)')
+    parser.add_argument('--pre-accept', action='store_true',
+                        help='With --batch, accept kaomojis with both species and emotion auto-tagged without editing')
+    parser.add_argument('--report', help='Write per-stage timings and counters to this JSON file')
+    parser.add_argument('--progress', action='store_true', help='Show a live progress line and a stage summary on stderr')
+    parser.add_argument('--log-level', default='WARNING',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Logging level; DEBUG shows the parsed editor buffers (default: WARNING)')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format='%(levelname)s %(name)s: %(message)s')
+
+    # Process all JSON files in the workspace's dirty_json directory, wherever it is run from
+    dirty_dir = DIRTY_DIR
+    cleaned_dir = CLEANED_DIR
+    cleaned_dir.mkdir(exist_ok=True)
+    
+    if args.compact:
+        if not Path(QUEUE_PATH).exists():
+            print("No unfinished sessions found")
+            return
+        queue = WorkQueue()
+        unexported = queue.unexported_sessions()
+        for session in unexported:
+            output_path, saved = queue.export_session(session, cleaned_dir)
+            print(f"Exported {output_path.name} ({saved} kaomojis)")
+        queue.close()
+        if not unexported:
+            print("No unfinished sessions found")
+        return
+    
+    if not dirty_dir.exists():
+        print("Error: dirty_json directory not found")
+        return
+    
+    json_files = list(dirty_dir.glob('*.json'))
+    
+    if not json_files:
+        print("No JSON files found in dirty_json directory")
+        return
+    
+    # Do all auto-tagging up front so review never waits on it
+    if not args.no_pretag:
+        with STATS.stage('pretag'):
+            file_count, record_count = pretag_all(dirty_dir)
+        if file_count:
+            print(f"Pre-tagged {record_count} kaomojis from {file_count} files")
+    
+    # Queue every dirty kaomoji; files imported by an earlier session are not re-read
+    queue = WorkQueue()
+    queued_count = sum(queue.enqueue_file(json_file) for json_file in json_files)
+    if queued_count:
+        print(f"Queued {queued_count} new kaomojis for review")
+    # Files in queue order, so a near-duplicate cluster's representative (its
+    # earliest item) is reviewed before any file holding one of its variants
+    order = {source: i for i, source in enumerate(queue.source_order())}
+    json_files.sort(key=lambda path: (order.get(path.name, len(order)), path.name))
+    if not args.no_pretag:
+        for json_file in json_files:
+            queue.attach_pretagged(load_pretagged(json_file))
+    if args.progress:
+        STATS.start_progress(sum(queue.counts().get(state, 0) for state in OPEN_STATES), "kaomojis")
+    
+    # Resume the most recent interrupted session, or start a new timestamped output
+    unexported = queue.unexported_sessions()
+    for old_session in unexported[:-1]:
+        queue.export_session(old_session, cleaned_dir)
+    if unexported:
+        session = unexported[-1]
+        print(f"Resuming {session}: {queue.session_size(session)} kaomojis already reviewed")
+    else:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        session = f"cleaned_kaomoji_{timestamp}.json"
+        queue.start_session(session)
+    
+    # Kaomoji already in cleaned/ bypass review; their canonical entries are
+    # only loaded if one of them actually shows up
+    seen = SeenIndex(cleaned_dir)
+    canonical = None
+    
+    # Near-duplicate clusters, keyed by the representative reviewed first
+    pending = {}
+    clusters = {}
+    if args.group_variants:
+        pending = {kaomoji_id: kaomoji_data for kaomoji_id, kaomoji_data in queue.open_contents().items()
+                   if kaomoji_id not in seen}
+        for members in cluster_variants({kaomoji_id: data.get('content', '') for kaomoji_id, data in pending.items()}):
+            clusters[members[0]] = members
+        print(f"Grouped {sum(len(members) for members in clusters.values())} kaomojis into {len(clusters)} near-duplicate clusters")
+    
+    processed_count = 0
+    skipped_count = 0
+    known_count = 0
+    merged_count = 0
+    
+    # Variants are decided together with their representative, never queued on their own
+    variant_ids = {variant_id for members in clusters.values() for variant_id in members[1:]}
+    
+    def record_decision(kaomoji_id, processed):
+        """Commit a reviewed kaomoji and the rest of its cluster in one transaction"""
+        nonlocal processed_count, skipped_count
+        decisions = {kaomoji_id: processed}
+        
+        # The representative's decision covers the whole cluster
+        for variant_id in clusters.get(kaomoji_id, [kaomoji_id])[1:]:
+            if processed is not None and not args.drop_variants:
+                decisions[variant_id] = apply_to_variant(processed, pending[variant_id])
+            else:
+                decisions[variant_id] = None
+        
+        with STATS.stage('write'):
+            queue.commit(session, decisions)
+        for decided_id, entry in decisions.items():
+            if entry is not None:
+                seen.add(decided_id)
+                processed_count += 1
+            else:
+                skipped_count += 1
+        STATS.advance(len(decisions))
+    
+    try:
+        for json_file in json_files:
+            print(f"Processing {json_file.name}...")
+            review_queue = []
+            
+            # Only the items still open in the queue; decided ones cost nothing on resume
+            for kaomoji_id, kaomoji_data, pretagged in queue.claim(json_file.name):
+                if kaomoji_id in variant_ids:
+                    # Decided with its cluster representative
+                    pass
+                elif kaomoji_id in seen:
+                    if canonical is None:
+                        compact(cleaned_dir)
+                        canonical, _ = load_canonical()
+                    existing = canonical.get(kaomoji_id)
+                    merged = merge_known_kaomoji(existing, kaomoji_data) if existing else None
+                    # Nothing new to merge is not a deletion: a later scrape may bring new tags
+                    with STATS.stage('write'):
+                        if merged is not None:
+                            queue.commit(session, {kaomoji_id: merged})
+                            merged_count += 1
+                        else:
+                            queue.mark_known(session, [kaomoji_id])
+                    known_count += 1
+                    STATS.advance()
+                elif args.batch > 1:
+                    review_queue.append((kaomoji_id, pretagged or auto_tag_kaomoji(kaomoji_data)))
+                else:
+                    variant_count = len(clusters.get(kaomoji_id, [kaomoji_id])) - 1
+                    record_decision(kaomoji_id, process_kaomoji(kaomoji_id, kaomoji_data, variant_count, pretagged))
+            
+            # Batched review: one editor buffer per chunk of the queue
+            for start in range(0, len(review_queue), args.batch):
+                # Tagged when claimed; keywords added in earlier chunks apply too
+                chunk = [(kaomoji_id, rematch_keywords(record))
+                         for kaomoji_id, record in review_queue[start:start + args.batch]]
+                with STATS.stage('review_wait'):
+                    decisions = review_batch(chunk, pre_accept=args.pre_accept)
+                for kaomoji_id, _ in chunk:
+                    record_decision(kaomoji_id, decisions.get(kaomoji_id))
+            
+            KEYWORDS.flush()
+            
+            # Remove decided kaomojis from the dirty file; the queue already holds every decision
+            with open(json_file, 'r', encoding='utf-8') as f:
+                messy_data = json.load(f)
+            STATS.read_file(json_file, json_file.stat().st_size)
+            decided = queue.decided_ids(json_file.name)
+            kaomojis_to_remove = [kaomoji_id for kaomoji_id in messy_data if kaomoji_id in decided]
+            for kaomoji_id in kaomojis_to_remove:
+                messy_data.pop(kaomoji_id)
+            
+            # Save updated dirty file (with processed kaomojis removed)
+            if messy_data:  # Only save if there are remaining kaomojis
+                with STATS.stage('write'), open(json_file, 'w', encoding='utf-8') as f:
+                    json.dump(messy_data, f, indent=2, ensure_ascii=False)
+                    STATS.wrote_file(f.tell())
+            else:
+                # Delete empty file
+                json_file.unlink()
+                print(f"  Deleted empty file: {json_file.name}")
+            queue.record_source(json_file)
+            discard_pretagged(json_file)
+            
+            print(f"  Processed {len(kaomojis_to_remove)} kaomojis from {json_file.name}")
+        
+        with STATS.stage('write'):
+            output_path, _ = queue.export_session(session, cleaned_dir)
+    finally:
+        STATS.finish_progress()
+        queue.close()
+        KEYWORDS.flush()
+        STATS.count('saved', processed_count)
+        STATS.count('skipped', skipped_count)
+        STATS.count('known', known_count)
+        STATS.count('merged', merged_count)
+        STATS.count('entries', processed_count + skipped_count + known_count)
+        if args.report:
+            STATS.write_report(args.report)
+            print(f"Timing report written to {args.report}")
+    
+    print(f"\nSummary:")
+    print(f"  Saved: {processed_count} kaomojis")
+    print(f"  Skipped: {skipped_count} kaomojis")
+    print(f"  Already cleaned: {known_count} kaomojis ({merged_count} with new tags merged)")
+    print(f"  Output: {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+'''
+Near-Duplicate Detection
+Groups kaomoji that differ only in whitespace, braille blank padding,
+mirrored dot art or a few swapped decorations
+
+Two passes, both linear in the number of entries:
+  1. exact buckets on a normalized, mirror-invariant form of the content
+  2. one-permutation MinHash over character shingles with LSH banding;
+     candidates that share a band are confirmed with an exact Jaccard check
+
+A short kaomoji has fewer shingles than signature slots, so most of its slots
+would stay empty and every short kaomoji would share the all-empty bands.
+Empty slots are therefore densified by rotation: each borrows the value of
+the next filled slot to its right, offset by the distance it was borrowed
+over.
+'''
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+
+BRAILLE_BASE = 0x2800
+BRAILLE_BLANK = '⠀'
+
+SHINGLE_SIZE = 3
+NUM_HASHES = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_HASHES // BANDS
+SIMILARITY_THRESHOLD = 0.8
+
+# Signature slots for one-permutation MinHash: the low bits of a shingle's
+# hash pick the slot, the remaining bits compete for that slot's minimum
+_SLOT_BITS = NUM_HASHES.bit_length() - 1
+_SLOT_MASK = NUM_HASHES - 1
+_EMPTY_SLOT = 1 << 32
+# Above any slot value, so borrowed values never equal a slot's own minimum
+_ROTATION_OFFSET = 1 << (32 - _SLOT_BITS)
+
+# Braille dot bits, left column 1,2,3,7 and right column 4,5,6,8
+_MIRROR_BIT_PAIRS = ((0x01, 0x08), (0x02, 0x10), (0x04, 0x20), (0x40, 0x80))
+
+_MIRROR_PAIRS = {'(': ')', '[': ']', '{': '}', '<': '>', '/': '\\', '«': '»', '（': '）'}
+
+_SPACE_RUN = re.compile(rf'[\s{BRAILLE_BLANK}]+')
+
+
+def _mirror_braille_char(code_point):
+    dots = code_point - BRAILLE_BASE
+    mirrored = 0
+    for left, right in _MIRROR_BIT_PAIRS:
+        if dots & left:
+            mirrored |= right
+        if dots & right:
+            mirrored |= left
+    return chr(BRAILLE_BASE + mirrored)
+
+
+# Left-right mirror table for braille cells and paired brackets
+_MIRROR_TABLE = {cp: _mirror_braille_char(cp) for cp in range(BRAILLE_BASE, BRAILLE_BASE + 256)}
+_MIRROR_TABLE.update({ord(a): b for a, b in _MIRROR_PAIRS.items()})
+_MIRROR_TABLE.update({ord(b): a for a, b in _MIRROR_PAIRS.items()})
+
+
+def normalize(content):
+    """Collapse whitespace and braille blank padding, NFKC fold, drop empty lines"""
+    content = unicodedata.normalize('NFKC', content)
+    lines = (_SPACE_RUN.sub(' ', line).strip() for line in content.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def mirror(content):
+    """Left-right mirror image of (normalized) content"""
+    return '\n'.join(line[::-1].translate(_MIRROR_TABLE) for line in content.split('\n'))
+
+
+def canonical_form(content):
+    """Normalized content that is identical for a kaomoji and its mirror image"""
+    normalized = normalize(content)
+    return min(normalized, mirror(normalized))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(shingle_set):
+    """One-permutation MinHash signature, a single pass over the shingles"""
+    signature = [_EMPTY_SLOT] * NUM_HASHES
+    for shingle in shingle_set:
+        h = zlib.crc32(shingle.encode('utf-8'))
+        slot, value = h & _SLOT_MASK, h >> _SLOT_BITS
+        if value < signature[slot]:
+            signature[slot] = value
+    return densify(signature)
+
+
+def densify(signature):
+    """Fill empty slots from the next filled slot to the right, wrapping around"""
+    densified = list(signature)
+    borrowed, distance = None, 0
+    # Two laps right to left, so slots before the wrap-around see its value
+    for i in reversed(range(2 * NUM_HASHES)):
+        slot = i % NUM_HASHES
+        if signature[slot] != _EMPTY_SLOT:
+            borrowed, distance = signature[slot], 0
+        else:
+            distance += 1
+            if borrowed is not None:
+                densified[slot] = borrowed + distance * _ROTATION_OFFSET
+    return densified
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+
+def cluster_variants(contents, threshold=SIMILARITY_THRESHOLD):
+    """Group near-duplicate kaomoji
+
+    Args:
+        contents: mapping of emoji_id to content, in review order
+        threshold: minimum shingle Jaccard similarity for a fuzzy match
+
+    Returns:
+        List of clusters (lists of emoji_ids in input order) with two or more members
+    """
+    groups = _UnionFind()
+    order = {emoji_id: i for i, emoji_id in enumerate(contents)}
+
+    exact_buckets = {}
+    for emoji_id, content in contents.items():
+        form = canonical_form(content)
+        if form in exact_buckets:
+            groups.union(exact_buckets[form], emoji_id)
+        else:
+            exact_buckets[form] = emoji_id
+
+    # Fuzzy pass over one representative per exact bucket. Each entry is only
+    # compared against the first member of the LSH bands it falls in, which
+    # keeps the pass linear; transitivity through union-find does the rest.
+    shingle_sets = {}
+    band_buckets = defaultdict(dict)
+    for form, emoji_id in exact_buckets.items():
+        shingle_set = shingles(form)
+        shingle_sets[emoji_id] = shingle_set
+        signature = minhash(shingle_set)
+        for band in range(BANDS):
+            key = tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+            first = band_buckets[band].setdefault(key, emoji_id)
+            if first != emoji_id and jaccard(shingle_sets[first], shingle_set) >= threshold:
+                groups.union(first, emoji_id)
+
+    clusters = defaultdict(list)
+    for emoji_id in contents:
+        clusters[groups.find(emoji_id)].append(emoji_id)
+    return sorted(
+        (members for members in clusters.values() if len(members) > 1),
+        key=lambda members: order[members[0]],
+    )
@@ -0,0 +1,171 @@
+'''
+Kaomoji Pre-tagging Stage
+Runs the non-interactive auto-tagging (cleaning, classification, keyword
+matching) over every dirty_json/*.json file in a process pool and stages the
+results, so the review loop in messy_to_clean only has to load them
+
+Staged files live in pretagged/ and are tied to the mtime/size of their
+dirty file; a changed dirty file is simply pre-tagged again.
+'''
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from .autotag import KEYWORDS, auto_tag_many
+from .instrument import STATS
+from .workspace import ROOT_DIR
+
+DIRTY_DIR = ROOT_DIR / 'dirty_json'
+STAGING_DIR = ROOT_DIR / 'pretagged'
+
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def keywords_stamp():
+    """Identifies the keyword files the species/emotion tags were matched against"""
+    return [file_stamp(KEYWORDS.species.path), file_stamp(KEYWORDS.emotions.path)]
+
+
+def staging_path(dirty_file, staging_dir=STAGING_DIR):
+    return Path(staging_dir) / Path(dirty_file).name
+
+
+def pretag_file(dirty_file, staging_dir=STAGING_DIR):
+    """Auto-tag every kaomoji in one dirty file and write the staged records
+
+    Returns:
+        Number of records staged
+    """
+    dirty_file = Path(dirty_file)
+    stamp = file_stamp(dirty_file)
+    with open(dirty_file, 'r', encoding='utf-8') as f:
+        messy_data = json.load(f)
+    STATS.read_file(dirty_file, stamp[1])
+
+    staged = {
+        'source_stamp': stamp,
+        'keywords_stamp': keywords_stamp(),
+        'records': auto_tag_many(messy_data),
+    }
+
+    out_path = staging_path(dirty_file, staging_dir)
+    tmp_path = out_path.with_name(out_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(staged, f, ensure_ascii=False)
+    STATS.wrote_file(tmp_path.stat().st_size)
+    os.replace(tmp_path, out_path)
+    return len(staged['records'])
+
+
+def load_pretagged(dirty_file, staging_dir=STAGING_DIR):
+    """Staged records for a dirty file, or {} if missing or stale
+
+    Species/emotion are re-matched when the keyword files changed since
+    pre-tagging; that is cheap compared to the cleaning and classification.
+    """
+    path = staging_path(dirty_file, staging_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            staged = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    STATS.read_file(path, path.stat().st_size)
+    if staged.get('source_stamp') != file_stamp(dirty_file):
+        return {}
+
+    records = staged['records']
+    if staged.get('keywords_stamp') != keywords_stamp():
+        for record in records.values():
+            rematch_keywords(record)
+    return records
+
+
+def rematch_keywords(record):
+    """Match a staged record's species/emotion against the current keyword lists
+
+    Keywords added during review are live in KEYWORDS before they are flushed,
+    so re-matching right before review lets them tag the rest of the file.
+    """
+    with STATS.stage('tag'):
+        record['species'] = KEYWORDS.auto_tag_species(record['misc'])
+        record['emotion'] = KEYWORDS.auto_tag_emotion(record['misc'])
+    return record
+
+
+def discard_pretagged(dirty_file, staging_dir=STAGING_DIR):
+    try:
+        staging_path(dirty_file, staging_dir).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def is_fresh(dirty_file, staging_dir=STAGING_DIR):
+    try:
+        with open(staging_path(dirty_file, staging_dir), 'r', encoding='utf-8') as f:
+            staged = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    return staged.get('source_stamp') == file_stamp(dirty_file)
+
+
+def _pretag_worker(dirty_file, staging_dir):
+    """pretag_file in a pool process, returning that process's stats for merging"""
+    STATS.reset()
+    count = pretag_file(dirty_file, staging_dir)
+    return count, STATS.snapshot()
+
+
+def pretag_all(dirty_dir=DIRTY_DIR, staging_dir=STAGING_DIR, jobs=None, force=False):
+    """Pre-tag every dirty file that has no fresh staged copy
+
+    Returns:
+        Tuple of (files pre-tagged, records staged)
+    """
+    Path(staging_dir).mkdir(exist_ok=True)
+    dirty_files = sorted(Path(dirty_dir).glob('*.json'))
+    todo = [path for path in dirty_files if force or not is_fresh(path, staging_dir)]
+    if not todo:
+        return 0, 0
+
+    record_count = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(_pretag_worker, path, staging_dir): path for path in todo}
+        for future in as_completed(futures):
+            path = futures[future]
+            count, snapshot = future.result()
+            STATS.merge(snapshot)
+            record_count += count
+            print(f"  Pre-tagged {count} kaomojis from {path.name}")
+    return len(todo), record_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Auto-tag dirty kaomoji files ahead of review')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Worker processes (default: one per CPU)')
+    parser.add_argument('--dirty', default=str(DIRTY_DIR), help='Directory of messy JSON files')
+    parser.add_argument('--staging', default=str(STAGING_DIR), help='Directory for pre-tagged records')
+    parser.add_argument('--force', action='store_true', help='Re-tag files that are already staged')
+    args = parser.parse_args()
+
+    if not Path(args.dirty).exists():
+        print(f"Error: {args.dirty} directory not found")
+        return
+
+    file_count, record_count = pretag_all(args.dirty, args.staging, args.jobs, args.force)
+    if file_count:
+        print(f"Pre-tagged {record_count} kaomojis from {file_count} files into {args.staging}")
+    else:
+        print("Everything is already pre-tagged")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+'''
+Kaomoji Previews
+Bounded previews for the review prompt and the fzf preview pane, so showing
+a kaomoji costs the same however big the art is
+
+Content that fits in PREVIEW_LINES x PREVIEW_WIDTH is shown as is. Larger
+braille art is scaled down by merging 2x2 cells into one (a dot is set if any
+dot it covers was set) until it fits; anything else is cut to the first lines
+and columns. Previews are cached in cleaned/.preview_cache.sqlite by
+emoji_id together with a hash of the content they were made from.
+'''
+import argparse
+import hashlib
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+from .classify import classify
+from .search_index import DEFAULT_SOURCE, SearchIndex
+
+CACHE_NAME = '.preview_cache.sqlite'
+CACHE_PATH = DEFAULT_SOURCE / CACHE_NAME
+
+PREVIEW_LINES = 24
+PREVIEW_WIDTH = 80
+
+# Bump when the preview layout changes so cached previews are redrawn
+PREVIEW_FORMAT = 1
+
+BRAILLE_BASE = 0x2800
+ELLIPSIS = '…'
+
+_TSV_ESCAPE = re.compile(r'\\[\\tnr]')
+_TSV_UNESCAPES = {'\\\\': '\\', '\\t': '\t', '\\n': '\n', '\\r': '\r'}
+
+
+def _dot_bit(x, y):
+    """Bit of the braille dot in column x (0-1) and row y (0-3)"""
+    return 1 << (y + 3 * x if y < 3 else 6 + x)
+
+
+def _merge_table(dx, half):
+    """Dots a source cell sets in the merged cell, for each of its 256 patterns
+
+    The source cell lands in column dx of the merged cell, in its upper
+    (half 0) or lower (half 1) two rows; each pair of its rows becomes one.
+    """
+    table = []
+    for pattern in range(256):
+        merged = 0
+        for y in range(4):
+            if any(pattern & _dot_bit(x, y) for x in range(2)):
+                merged |= _dot_bit(dx, 2 * half + y // 2)
+        table.append(merged)
+    return table
+
+
+# (column, half) of a source cell within its 2x2 block -> merge table
+_MERGE_TABLES = [((dx, half), _merge_table(dx, half)) for half in range(2) for dx in range(2)]
+
+
+def _cell_pattern(char):
+    code_point = ord(char)
+    if BRAILLE_BASE <= code_point <= BRAILLE_BASE + 0xFF:
+        return code_point - BRAILLE_BASE
+    return 0 if char.isspace() else 0xFF
+
+
+def thumbnail(lines):
+    """Halve art in both directions by merging each 2x2 block of cells"""
+    width = max((len(line) for line in lines), default=0)
+    grid = [[_cell_pattern(char) for char in line.ljust(width)] for line in lines]
+    if len(grid) % 2:
+        grid.append([0] * width)
+    merged_lines = []
+    for row in range(0, len(grid), 2):
+        cells = []
+        for col in range(0, width, 2):
+            pattern = 0
+            for (dx, half), table in _MERGE_TABLES:
+                source_row = grid[row + half]
+                if col + dx < width:
+                    pattern |= table[source_row[col + dx]]
+            cells.append(chr(BRAILLE_BASE + pattern))
+        merged_lines.append(''.join(cells).rstrip(chr(BRAILLE_BASE)))
+    return merged_lines
+
+
+def clip(lines, max_lines=PREVIEW_LINES, max_width=PREVIEW_WIDTH):
+    clipped = [line if len(line) <= max_width else line[:max_width - 1] + ELLIPSIS
+               for line in lines[:max_lines]]
+    if len(lines) > max_lines:
+        clipped[-1] = f"{ELLIPSIS} ({len(lines) - max_lines + 1} more lines)"
+    return clipped
+
+
+def render_preview(content, max_lines=PREVIEW_LINES, max_width=PREVIEW_WIDTH):
+    """Preview of at most max_lines lines of at most max_width characters"""
+    lines = content.split('\n')
+    width = max(len(line) for line in lines)
+    if len(lines) <= max_lines and width <= max_width:
+        return content
+
+    scale = 1
+    if classify(content).dotArt:
+        while (len(lines) > max_lines or width > max_width) and (len(lines) > 1 or width > 1):
+            lines = thumbnail(lines)
+            width = max((len(line) for line in lines), default=0)
+            scale *= 2
+    preview = clip(lines, max_lines - 1 if scale > 1 else max_lines, max_width)
+    if scale > 1:
+        preview.append(f"(thumbnail, 1/{scale} scale)")
+    return '\n'.join(preview)
+
+
+def content_hash(content):
+    return hashlib.blake2b(f"{PREVIEW_FORMAT}\0{content}".encode('utf-8'), digest_size=8).digest()
+
+
+class PreviewCache:
+    """Rendered previews keyed by emoji_id, redrawn when the content changes"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, timeout=0.5)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS previews (
+                emoji_id TEXT PRIMARY KEY,
+                hash BLOB NOT NULL,
+                preview TEXT NOT NULL
+            )
+        ''')
+
+    def lookup(self, emoji_id, content):
+        digest = content_hash(content)
+        row = self.conn.execute('SELECT hash, preview FROM previews WHERE emoji_id = ?', (emoji_id,)).fetchone()
+        if row is not None and row[0] == digest:
+            return row[1], None
+        return None, digest
+
+    def get(self, emoji_id, content):
+        """Preview for one entry, rendered and stored on a miss"""
+        preview, digest = self.lookup(emoji_id, content)
+        if preview is None:
+            preview = render_preview(content)
+            try:
+                with self.conn:
+                    self.conn.execute('INSERT OR REPLACE INTO previews (emoji_id, hash, preview) VALUES (?, ?, ?)',
+                                      (emoji_id, digest, preview))
+            except sqlite3.OperationalError:
+                # Another preview holds the lock; the next call stores it
+                pass
+        return preview
+
+    def build(self, entries):
+        """Render the previews of (emoji_id, content) pairs that are missing or stale
+
+        Returns:
+            Number of previews rendered
+        """
+        stale = []
+        for emoji_id, content in entries:
+            preview, digest = self.lookup(emoji_id, content)
+            if preview is None:
+                stale.append((emoji_id, digest, render_preview(content)))
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO previews (emoji_id, hash, preview) VALUES (?, ?, ?)',
+                                  stale)
+        return len(stale)
+
+    def close(self):
+        self.conn.close()
+
+
+_cache = None
+
+
+def cached_preview(emoji_id, content):
+    """Preview through the shared cache, or rendered directly if it cannot be opened"""
+    global _cache
+    try:
+        if _cache is None:
+            _cache = PreviewCache()
+        return _cache.get(emoji_id, content)
+    except sqlite3.Error:
+        return render_preview(content)
+
+
+def tsv_unescape(value):
+    """Undo the @tsv escaping of a search index field"""
+    return _TSV_ESCAPE.sub(lambda match: _TSV_UNESCAPES[match.group()], value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the bounded preview of a cleaned kaomoji')
+    parser.add_argument('emoji_id', nargs='?', help='Kaomoji ID')
+    parser.add_argument('-s', '--source', default=str(DEFAULT_SOURCE),
+                        help='Directory of cleaned JSON files')
+    parser.add_argument('--build', action='store_true', help='Precompute the previews of every cleaned kaomoji')
+    parser.add_argument('--cache', help='Path of the preview cache (default: SOURCE/%s)' % CACHE_NAME)
+    args = parser.parse_args()
+    if not args.build and args.emoji_id is None:
+        parser.error('emoji_id is required unless --build is given')
+
+    # The rows fzf shows came from the search index, so it is already current
+    index = SearchIndex(args.source)
+    cache = PreviewCache(args.cache or Path(args.source) / CACHE_NAME)
+    try:
+        if args.build:
+            index.refresh()
+            entries = [(row.split('\t', 1)[0], row.rsplit('\t', 1)[1]) for row in index.query()]
+            rendered = cache.build((tsv_unescape(emoji_id), tsv_unescape(content)) for emoji_id, content in entries)
+            print(f"Rendered {rendered} of {len(entries)} previews")
+            return
+        row = index.row(args.emoji_id)
+        if row is None:
+            sys.exit(1)
+        sys.stdout.write(cache.get(args.emoji_id, tsv_unescape(row.rsplit('\t', 1)[1])) + '\n')
+    finally:
+        cache.close()
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+'''
+Kaomoji Re-classification
+Brings the hasEmoji / species / emotion fields of the cleaned shards up to
+date after emoji_data.txt, species.txt or emotions.txt change, without going
+back through the interactive cleaner
+
+A provenance sidecar (cleaned/.provenance.sqlite) records, per entry and
+field, the rule-set version and the value those rules produced. Together with
+a reverse index from code points and misc keywords to entries, only entries
+touched by a changed code point or keyword are recomputed. Whatever the
+reviewer changed relative to the recorded automatic value is a manual
+override and is kept:
+  - hasEmoji: a value different from the recorded one is left alone
+  - species, emotion: tags the reviewer added stay, tags the reviewer removed
+    are not re-added, the rest follows the new rules
+
+Entries seen for the first time are recorded against the current rules,
+except on the first run: the shards written before the sidecar existed were
+classified by the original cleaner, so their baseline is what its rules
+produce (any code point named in emoji_data.txt, sequence elements included,
+counted as an emoji; misc tags were matched against the keyword lists as
+typed). That baseline has no snapshot, so the run after it rechecks every
+entry and fixes the values the old rules got wrong. --baseline picks the
+baseline explicitly, e.g. for old shards copied in later; 'stored' takes the
+values in the shard as automatic, so every entry follows the current rules
+and no earlier manual override survives.
+'''
+import argparse
+import hashlib
+import json
+import marshal
+import os
+import sqlite3
+from collections import defaultdict
+from pathlib import Path
+
+from .classify import DOT_ART_CHARS, classify_many
+from .compact_corpus import CLEANED_DIR, write_json_atomic
+from .emoji_index import SEQUENCE_END, load_emoji_index
+from .keywords import KeywordRegistry, fold
+
+PROVENANCE_NAME = '.provenance.sqlite'
+SHARD_PATTERN = 'cleaned_kaomoji_*.json'
+
+# Bump when the schema changes
+SCHEMA_VERSION = 1
+
+# Field -> column prefix in the entries table
+RULE_FIELDS = {'hasEmoji': 'emoji', 'species': 'species', 'emotion': 'emotion'}
+
+# Changed rules touching a code point below this cannot use the reverse
+# index (ASCII is not indexed) and recheck every entry instead
+INDEXED_CODEPOINTS = 0x80
+
+# Rules a new entry can be recorded under; every one but 'current' is also
+# the rule-set version recorded, which has no snapshot and is rechecked in full
+BASELINES = ('legacy', 'current', 'stored')
+
+
+def rules_version(snapshot):
+    return hashlib.sha1(marshal.dumps(snapshot)).hexdigest()[:12]
+
+
+def rule_snapshots(registry):
+    """Current rules of every field in a marshal-able, comparable form"""
+    emoji = load_emoji_index()
+    return {
+        'hasEmoji': (list(emoji.starts), list(emoji.ends), emoji.sequences),
+        'species': sorted(registry.species.mapping().items()),
+        'emotion': sorted(registry.emotions.mapping().items()),
+    }
+
+
+def _sequences(node, prefix=()):
+    for code_point, child in node.items():
+        if code_point == SEQUENCE_END:
+            yield prefix
+        else:
+            yield from _sequences(child, prefix + (code_point,))
+
+
+def changed_codepoints(old, new):
+    """Code points whose emoji status differs between two emoji snapshots
+
+    A changed sequence is represented by its highest code point: every entry
+    containing the sequence contains that code point.
+    """
+    def expand(snapshot):
+        starts, ends, sequences = snapshot
+        singles = {cp for start, end in zip(starts, ends) for cp in range(start, end + 1)}
+        return singles, set(_sequences(sequences))
+
+    old_singles, old_sequences = expand(old)
+    new_singles, new_sequences = expand(new)
+    changed = old_singles ^ new_singles
+    changed.update(max(sequence) for sequence in old_sequences ^ new_sequences)
+    return changed
+
+
+def legacy_codepoints(emoji):
+    """Code points the original cleaner flagged: every single emoji and sequence element"""
+    code_points = {cp for start, end in zip(emoji.starts, emoji.ends) for cp in range(start, end + 1)}
+    for sequence in _sequences(emoji.sequences):
+        code_points.update(sequence)
+    return code_points
+
+
+def changed_keywords(old, new):
+    """Folded misc keys that resolve to a different keyword (or none) now"""
+    old, new = dict(old), dict(new)
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+def indexed_codepoints(content):
+    return {ord(char) for char in set(content)
+            if ord(char) >= INDEXED_CODEPOINTS and char not in DOT_ART_CHARS}
+
+
+def reapply(field, current, old_auto, new_auto):
+    """New value of a field, keeping the reviewer's changes to the old automatic value"""
+    if field == 'hasEmoji':
+        return current if current != old_auto else new_auto
+    old_keys = {fold(tag) for tag in old_auto}
+    new_keys = {fold(tag) for tag in new_auto}
+    current_keys = {fold(tag) for tag in current}
+    kept = [tag for tag in current if fold(tag) not in old_keys or fold(tag) in new_keys]
+    added = [tag for tag in new_auto if fold(tag) not in current_keys and fold(tag) not in old_keys]
+    return kept + added
+
+
+def overridden(field, value, old_auto, new_auto):
+    """True if a manual override kept a change of the rules out of the value"""
+    if field == 'hasEmoji':
+        return old_auto != new_auto and value != new_auto
+    old_keys = {fold(tag) for tag in old_auto}
+    new_keys = {fold(tag) for tag in new_auto}
+    value_keys = {fold(tag) for tag in value}
+    return any((key in new_keys) != (key in value_keys) for key in old_keys ^ new_keys)
+
+
+class Reclassifier:
+    """Provenance and reverse index for one directory of cleaned shards"""
+
+    def __init__(self, cleaned_dir=CLEANED_DIR, registry=None):
+        self.cleaned_dir = Path(cleaned_dir)
+        self.path = self.cleaned_dir / PROVENANCE_NAME
+        self.registry = registry or KeywordRegistry()
+        self.conn = sqlite3.connect(self.path)
+        self._init_schema()
+        self.snapshots = rule_snapshots(self.registry)
+        self.versions = {field: rules_version(snapshot) for field, snapshot in self.snapshots.items()}
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO rulesets (version, field, snapshot) VALUES (?, ?, ?)',
+                ((self.versions[field], field, marshal.dumps(snapshot))
+                 for field, snapshot in self.snapshots.items()))
+
+    def _init_schema(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise RuntimeError(f"{self.path} has schema version {version}, expected {SCHEMA_VERSION}")
+        columns = ''.join(f'{prefix}_rules TEXT NOT NULL, {prefix}_auto TEXT NOT NULL, '
+                          for prefix in RULE_FIELDS.values())
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS shards (
+                name TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                shard TEXT NOT NULL,
+                emoji_id TEXT NOT NULL,
+                {columns}
+                UNIQUE (shard, emoji_id)
+            );
+            CREATE TABLE IF NOT EXISTS codepoints (
+                codepoint INTEGER NOT NULL,
+                entry INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS codepoints_codepoint ON codepoints (codepoint);
+            CREATE INDEX IF NOT EXISTS codepoints_entry ON codepoints (entry);
+            CREATE TABLE IF NOT EXISTS misc_keys (
+                key TEXT NOT NULL,
+                entry INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS misc_keys_key ON misc_keys (key);
+            CREATE INDEX IF NOT EXISTS misc_keys_entry ON misc_keys (entry);
+            CREATE TABLE IF NOT EXISTS rulesets (
+                version TEXT PRIMARY KEY,
+                field TEXT NOT NULL,
+                snapshot BLOB NOT NULL
+            );
+            PRAGMA user_version = {SCHEMA_VERSION};
+        ''')
+
+    def auto_values(self, field, entries):
+        """What the current rules produce for a field of each entry"""
+        if field == 'hasEmoji':
+            return [flags.hasEmoji for flags in classify_many(entry.get('content', '') for entry in entries)]
+        # Same resolution as KeywordList.match, without a stat per entry
+        mapping = dict(self.snapshots[field])
+        values = []
+        for entry in entries:
+            matched = []
+            for tag in entry.get('misc', []):
+                canonical = mapping.get(fold(tag))
+                if canonical is not None and canonical not in matched:
+                    matched.append(canonical)
+            values.append(matched)
+        return values
+
+    def baseline_values(self, field, entries, baseline):
+        """Automatic values a field of each entry is recorded with on first sight"""
+        if baseline == 'current':
+            return self.auto_values(field, entries)
+        if baseline == 'stored':
+            default = False if field == 'hasEmoji' else []
+            return [entry.get(field, default) for entry in entries]
+        # What the original cleaner's rules produce
+        if field == 'hasEmoji':
+            code_points = legacy_codepoints(load_emoji_index())
+            return [any(ord(char) in code_points for char in entry.get('content', '')) for entry in entries]
+        mapping = dict(self.snapshots[field])
+        return [[tag for tag in entry.get('misc', []) if fold(tag) in mapping] for entry in entries]
+
+    def _load_shard(self, name):
+        with open(self.cleaned_dir / name, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _stamp(self, name):
+        stat = os.stat(self.cleaned_dir / name)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _record_stamp(self, name):
+        self.conn.execute('INSERT OR REPLACE INTO shards (name, mtime_ns, size) VALUES (?, ?, ?)',
+                          (name, *self._stamp(name)))
+
+    def _drop_index(self, entry_ids):
+        for table in ('codepoints', 'misc_keys'):
+            self.conn.executemany(f'DELETE FROM {table} WHERE entry = ?', ((i,) for i in entry_ids))
+
+    def sync(self, baseline=None):
+        """Index added or changed shards and record a baseline for new entries
+
+        Entries already known keep their recorded automatic values, so edits
+        made to a shard by hand show up as manual overrides.
+
+        Args:
+            baseline: One of BASELINES for the new entries; by default
+                legacy on the first run, current afterwards
+
+        Returns:
+            Tuple of (shards indexed, new entries, baseline used)
+        """
+        if baseline is None:
+            first_run = self.conn.execute('SELECT 1 FROM entries LIMIT 1').fetchone() is None
+            baseline = 'legacy' if first_run else 'current'
+        on_disk = {path.name: self._stamp(path.name) for path in self.cleaned_dir.glob(SHARD_PATTERN)}
+        recorded = {name: (mtime_ns, size) for name, mtime_ns, size
+                    in self.conn.execute('SELECT name, mtime_ns, size FROM shards')}
+
+        indexed = added = 0
+        with self.conn:
+            for name in recorded.keys() - on_disk.keys():
+                gone = [i for (i,) in self.conn.execute('SELECT id FROM entries WHERE shard = ?', (name,))]
+                self._drop_index(gone)
+                self.conn.execute('DELETE FROM entries WHERE shard = ?', (name,))
+                self.conn.execute('DELETE FROM shards WHERE name = ?', (name,))
+
+        for name in sorted(on_disk):
+            if recorded.get(name) == on_disk[name]:
+                continue
+            added += self._index_shard(name, baseline)
+            indexed += 1
+        return indexed, added, baseline
+
+    def _index_shard(self, name, baseline):
+        shard = self._load_shard(name)
+        known = dict(self.conn.execute('SELECT emoji_id, id FROM entries WHERE shard = ?', (name,)))
+        with self.conn:
+            self._drop_index(known.values())
+            for emoji_id in known.keys() - shard.keys():
+                self.conn.execute('DELETE FROM entries WHERE id = ?', (known.pop(emoji_id),))
+            new_ids = [emoji_id for emoji_id in shard if emoji_id not in known]
+            known.update(self._insert_baseline(name, new_ids, [shard[emoji_id] for emoji_id in new_ids], baseline))
+            self.conn.executemany('INSERT INTO codepoints (codepoint, entry) VALUES (?, ?)',
+                                  ((cp, known[emoji_id]) for emoji_id, entry in shard.items()
+                                   for cp in indexed_codepoints(entry.get('content', ''))))
+            self.conn.executemany('INSERT INTO misc_keys (key, entry) VALUES (?, ?)',
+                                  ((key, known[emoji_id]) for emoji_id, entry in shard.items()
+                                   for key in {fold(tag) for tag in entry.get('misc', [])}))
+            self._record_stamp(name)
+        return len(new_ids)
+
+    def _insert_baseline(self, shard, emoji_ids, entries, baseline='current'):
+        """Record entries under one of BASELINES; returns {emoji_id: entry id}"""
+        columns = ['shard', 'emoji_id']
+        autos = []
+        for field, prefix in RULE_FIELDS.items():
+            columns += [f'{prefix}_rules', f'{prefix}_auto']
+            autos.append([json.dumps(value, ensure_ascii=False)
+                          for value in self.baseline_values(field, entries, baseline)])
+        query = f"INSERT INTO entries ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        inserted = {}
+        for i, emoji_id in enumerate(emoji_ids):
+            values = [shard, emoji_id]
+            for field, field_autos in zip(RULE_FIELDS, autos):
+                values += [self.versions[field] if baseline == 'current' else baseline, field_autos[i]]
+            inserted[emoji_id] = self.conn.execute(query, values).lastrowid
+        return inserted
+
+    def _lookup(self, table, column, keys, rules_column, version):
+        """Entries recorded under version that the reverse index links to any key"""
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS changed_keys (key PRIMARY KEY)')
+        self.conn.execute('DELETE FROM changed_keys')
+        self.conn.executemany('INSERT OR IGNORE INTO changed_keys VALUES (?)', ((key,) for key in keys))
+        return self.conn.execute(
+            f'SELECT DISTINCT e.id, e.shard, e.emoji_id FROM changed_keys k '
+            f'JOIN {table} r ON r.{column} = k.key JOIN entries e ON e.id = r.entry '
+            f'WHERE e.{rules_column} = ?', (version,)).fetchall()
+
+    def affected_entries(self):
+        """Entries whose fields may change under the current rules
+
+        Returns:
+            Tuple of ({shard: {(entry id, emoji_id): set of fields}},
+                      {field: (outdated versions, changed keys)})
+        """
+        affected = defaultdict(lambda: defaultdict(set))
+        changes = {}
+        for field, prefix in RULE_FIELDS.items():
+            rules_column = f'{prefix}_rules'
+            outdated = [version for (version,) in self.conn.execute(
+                f'SELECT DISTINCT {rules_column} FROM entries WHERE {rules_column} != ?', (self.versions[field],))]
+            changed_count = 0
+            for version in outdated:
+                row = self.conn.execute('SELECT snapshot FROM rulesets WHERE version = ?', (version,)).fetchone()
+                if row is None:
+                    rows = None
+                elif field == 'hasEmoji':
+                    keys = changed_codepoints(marshal.loads(row[0]), self.snapshots[field])
+                    changed_count += len(keys)
+                    rows = None if any(cp < INDEXED_CODEPOINTS for cp in keys) else \
+                        self._lookup('codepoints', 'codepoint', keys, rules_column, version)
+                else:
+                    keys = changed_keywords(marshal.loads(row[0]), self.snapshots[field])
+                    changed_count += len(keys)
+                    rows = self._lookup('misc_keys', 'key', keys, rules_column, version)
+                if rows is None:
+                    # Unknown old rules or unindexed code points: recheck them all
+                    rows = self.conn.execute(f'SELECT id, shard, emoji_id FROM entries WHERE {rules_column} = ?',
+                                             (version,)).fetchall()
+                for entry_id, shard, emoji_id in rows:
+                    affected[shard][(entry_id, emoji_id)].add(field)
+            changes[field] = (len(outdated), changed_count)
+        return affected, changes
+
+    def reclassify(self, dry_run=False):
+        """Recompute the affected entries and rewrite the shards that changed
+
+        Returns:
+            Dict of counts (rechecked, updated, overrides, shards) and, under
+            'changes', {field: (outdated rule sets, changed keys)}
+        """
+        affected, changes = self.affected_entries()
+        totals = {'rechecked': 0, 'updated': 0, 'overrides': 0, 'shards': 0, 'changes': changes}
+        for name, entries in sorted(affected.items()):
+            shard = self._load_shard(name)
+            present = [(entry_id, emoji_id) for entry_id, emoji_id in entries if emoji_id in shard]
+            totals['rechecked'] += len(present)
+            changed_ids = set()
+            for field, prefix in RULE_FIELDS.items():
+                targets = [(entry_id, emoji_id) for entry_id, emoji_id in present
+                           if field in entries[(entry_id, emoji_id)]]
+                new_autos = self.auto_values(field, [shard[emoji_id] for _, emoji_id in targets])
+                updates = []
+                for (entry_id, emoji_id), new_auto in zip(targets, new_autos):
+                    entry = shard[emoji_id]
+                    old_auto = json.loads(self.conn.execute(
+                        f'SELECT {prefix}_auto FROM entries WHERE id = ?', (entry_id,)).fetchone()[0])
+                    current = entry.get(field, False if field == 'hasEmoji' else [])
+                    value = reapply(field, current, old_auto, new_auto)
+                    if overridden(field, value, old_auto, new_auto):
+                        totals['overrides'] += 1
+                    if value != current:
+                        entry[field] = value
+                        changed_ids.add(emoji_id)
+                    updates.append((self.versions[field], json.dumps(new_auto, ensure_ascii=False), entry_id))
+                self.conn.executemany(f'UPDATE entries SET {prefix}_rules = ?, {prefix}_auto = ? WHERE id = ?',
+                                      updates)
+            totals['updated'] += len(changed_ids)
+            shard_changed = bool(changed_ids)
+
+            totals['shards'] += shard_changed
+            if dry_run:
+                continue
+            if shard_changed:
+                write_json_atomic(self.cleaned_dir / name, shard)
+                self._record_stamp(name)
+            self.conn.commit()
+
+        if dry_run:
+            self.conn.rollback()
+            return totals
+        # Entries no changed rule touches produce the same values under the new version
+        with self.conn:
+            for field, prefix in RULE_FIELDS.items():
+                self.conn.execute(f'UPDATE entries SET {prefix}_rules = ? WHERE {prefix}_rules != ?',
+                                  (self.versions[field], self.versions[field]))
+        return totals
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-classify cleaned kaomoji after the emoji data or keyword lists change')
+    parser.add_argument('-s', '--source', default=str(CLEANED_DIR), help='Directory of cleaned shards')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='Report what would change without writing')
+    parser.add_argument('-b', '--baseline', choices=BASELINES,
+                        help="Rules new entries are recorded under; 'stored' takes their values as automatic "
+                             "(default: legacy on the first run, then current)")
+    args = parser.parse_args()
+
+    reclassifier = Reclassifier(args.source)
+    try:
+        indexed, added, baseline = reclassifier.sync(args.baseline)
+        if indexed:
+            print(f"Indexed {indexed} new or changed shards ({added} new entries recorded under the {baseline} rules)")
+        totals = reclassifier.reclassify(dry_run=args.dry_run)
+    finally:
+        reclassifier.close()
+
+    for field, (outdated, changed) in totals['changes'].items():
+        if outdated:
+            print(f"{field}: {changed} changed {'code points' if field == 'hasEmoji' else 'keywords'} "
+                  f"since {outdated} older rule set(s)")
+    verb = 'Would update' if args.dry_run else 'Updated'
+    print(f"Rechecked {totals['rechecked']} entries. {verb} {totals['updated']} "
+          f"in {totals['shards']} shards, kept {totals['overrides']} manual overrides")
+
+
+if __name__ == '__main__':
+    main()
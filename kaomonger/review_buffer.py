@@ -0,0 +1,237 @@
+'''
+Review Buffer Format
+Writes kaomoji into the editable CONTENT/SPECIES/EMOTION/MISC/METADATA
+layout and parses edited buffers back, one record or many per buffer
+'''
+import json
+import os
+import re
+import subprocess
+import tempfile
+
+from .autotag import KEYWORDS
+from .search_index import SearchIndex
+from .tag_search import load_tag_index, suggest_tags
+
+SECTION_NAMES = ('CONTENT', 'SPECIES', 'EMOTION', 'MISC', 'METADATA')
+REFERENCE_MARKER = '# Available species'
+
+# Separates records in a batch buffer
+RECORD_DELIMITER = '##### KAOMOJI {} #####'
+_DELIMITER_PATTERN = re.compile(r'^##### KAOMOJI (\S+) #####$', re.MULTILINE)
+_ERROR_LINE = re.compile(r'^# ERROR: .*\n', re.MULTILINE)
+
+_NOT_LOADED = object()
+_tag_index = _NOT_LOADED
+
+
+def format_record(kaomoji_data):
+    """Editable sections for one kaomoji (without the keyword reference)"""
+    metadata = {
+        'dotArt': kaomoji_data['dotArt'],
+        'hasEmoji': kaomoji_data['hasEmoji'],
+        'multiLine': kaomoji_data['multiLine'],
+        'delete': kaomoji_data.get('delete', False)
+    }
+    return (
+        "CONTENT:\n" + kaomoji_data['content'] + "\n\n"
+        "SPECIES:\n" + json.dumps(kaomoji_data['species'], ensure_ascii=False) + "\n\n"
+        "EMOTION:\n" + json.dumps(kaomoji_data['emotion'], ensure_ascii=False) + "\n\n"
+        "MISC:\n" + json.dumps(kaomoji_data['misc'], ensure_ascii=False) + "\n\n"
+        "METADATA:\n" + json.dumps(metadata, indent=2, ensure_ascii=False)
+    )
+
+
+def corpus_tag_index():
+    """Tag index over the cleaned corpus, or None if it cannot be built"""
+    global _tag_index
+    if _tag_index is _NOT_LOADED:
+        _tag_index = None
+        search_index = None
+        try:
+            search_index = SearchIndex()
+            search_index.refresh()
+            _tag_index = load_tag_index(search_index)
+        except Exception as e:
+            # Suggestions are optional; a broken corpus must not stop a review
+            print(f"Warning: no corpus tag suggestions: {e}")
+        finally:
+            if search_index is not None:
+                search_index.close()
+    return _tag_index
+
+
+def format_suggestions(kaomoji_data):
+    """Comment lines suggesting keywords that were not auto-tagged, or ''"""
+    lines = []
+    tag_index = corpus_tag_index()
+    for field, kind, keyword_list in (('species', 'species', KEYWORDS.species),
+                                      ('emotion', 'emotion', KEYWORDS.emotions)):
+        assigned = {tag.casefold() for tag in kaomoji_data[field]}
+        suggested = [tag for tag in suggest_tags(kaomoji_data['misc'], keyword_list, kind, tag_index)
+                     if tag.casefold() not in assigned]
+        if suggested:
+            lines.append(f"# Suggested {field}: {', '.join(suggested)}\n")
+    return ''.join(lines)
+
+
+def format_reference():
+    """Current species and emotion lists, appended for editor completion"""
+    return (
+        "\n\n# Available species (for reference):\n"
+        "# " + ', '.join(KEYWORDS.species.sorted_tags()) + "\n"
+        "\n# Available emotions (for reference):\n"
+        "# " + ', '.join(KEYWORDS.emotions.sorted_tags()) + "\n"
+    )
+
+
+def parse_sections(text):
+    """Split an edited record into its sections; missing sections are left out"""
+    sections = {}
+    starts = {name: text.find(name + ':') for name in SECTION_NAMES}
+    reference_start = text.find(REFERENCE_MARKER)
+    end_of_record = reference_start if reference_start != -1 else len(text)
+
+    # Extract CONTENT (everything between CONTENT: and SPECIES:)
+    if starts['CONTENT'] != -1 and starts['SPECIES'] != -1:
+        sections['CONTENT'] = text[starts['CONTENT'] + len('CONTENT:'):starts['SPECIES']].strip()
+
+    # Each JSON section runs to the next section that is present
+    json_sections = SECTION_NAMES[1:]
+    for i, name in enumerate(json_sections):
+        start = starts[name]
+        following = [starts[later] for later in json_sections[i + 1:] if starts[later] != -1]
+        end = following[0] if following else end_of_record
+        if start != -1 and start < end:
+            sections[name] = text[start + len(name + ':'):end].strip()
+    return sections
+
+
+def apply_sections(kaomoji_data, sections):
+    """Return kaomoji_data updated from parsed sections
+
+    Raises:
+        json.JSONDecodeError: If a JSON section does not parse
+    """
+    edited_data = kaomoji_data.copy()
+    edited_data['content'] = sections.get('CONTENT', '')
+    edited_data['species'] = json.loads(sections.get('SPECIES', '[]'))
+    edited_data['emotion'] = json.loads(sections.get('EMOTION', '[]'))
+    edited_data['misc'] = json.loads(sections.get('MISC', '[]'))
+    edited_data.update(json.loads(sections.get('METADATA', '{}')))
+    return edited_data
+
+
+def is_confident(kaomoji_data):
+    """The auto-tagger found both a species and an emotion"""
+    return bool(kaomoji_data['species']) and bool(kaomoji_data['emotion'])
+
+
+def format_batch(records, errors=None, raw_records=None):
+    """One buffer holding many records, each introduced by a delimiter line
+
+    Args:
+        records: list of (kaomoji_id, data)
+        errors: kaomoji_id to an error message written above the record
+        raw_records: kaomoji_id to previously edited text, written back verbatim
+    """
+    errors = errors or {}
+    raw_records = raw_records or {}
+    parts = [
+        f"# Reviewing {len(records)} kaomojis\n"
+        "# Edit the content below each delimiter, then save and exit\n"
+        "# Set 'delete': true to skip a kaomoji; removing a whole record also skips it\n"
+        "# Lines starting with # outside CONTENT are comments\n"
+    ]
+    for kaomoji_id, kaomoji_data in records:
+        parts.append("\n" + RECORD_DELIMITER.format(kaomoji_id) + "\n")
+        if kaomoji_id in errors:
+            parts.append(f"# ERROR: {errors[kaomoji_id]}\n")
+        if kaomoji_id in raw_records:
+            raw = _ERROR_LINE.sub('', raw_records[kaomoji_id].split(REFERENCE_MARKER)[0])
+            parts.append(raw.strip('\n') + "\n")
+        else:
+            parts.append(format_suggestions(kaomoji_data))
+            parts.append(format_record(kaomoji_data) + "\n")
+    parts.append(format_reference())
+    return ''.join(parts)
+
+
+def split_batch(text):
+    """Map each kaomoji id in an edited batch buffer to its record text"""
+    matches = list(_DELIMITER_PATTERN.finditer(text))
+    records = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        records[match.group(1)] = text[match.end():end]
+    return records
+
+
+def review_batch(records, pre_accept=False):
+    """Review many kaomoji in a single editor buffer
+
+    Args:
+        records: list of (kaomoji_id, auto-tagged data)
+        pre_accept: accept records the auto-tagger is confident about without editing
+
+    Returns:
+        Dict of kaomoji_id to the accepted data, or None if it was deleted/skipped
+    """
+    editor = os.environ.get('EDITOR', 'vim')
+    decisions = {}
+    to_edit = []
+    for kaomoji_id, kaomoji_data in records:
+        if pre_accept and is_confident(kaomoji_data):
+            decisions[kaomoji_id] = dict(kaomoji_data)
+        else:
+            to_edit.append((kaomoji_id, kaomoji_data))
+    if decisions:
+        print(f"Pre-accepted {len(decisions)} confidently tagged kaomojis")
+
+    errors = {}
+    raw_records = {}
+    while to_edit:
+        print(f"\nReviewing {len(to_edit)} kaomojis in one buffer")
+        response = input("Press Enter to open in editor, or 's' to skip them all: ")
+        if response.lower() == 's':
+            decisions.update((kaomoji_id, None) for kaomoji_id, _ in to_edit)
+            break
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write(format_batch(to_edit, errors, raw_records))
+            temp_path = f.name
+        try:
+            subprocess.run([editor, temp_path])
+            with open(temp_path, 'r', encoding='utf-8') as f:
+                edited = split_batch(f.read())
+        finally:
+            os.unlink(temp_path)
+
+        failed = []
+        errors = {}
+        raw_records = {}
+        for kaomoji_id, kaomoji_data in to_edit:
+            if kaomoji_id not in edited:
+                decisions[kaomoji_id] = None
+                continue
+            try:
+                edited_data = apply_sections(kaomoji_data, parse_sections(edited[kaomoji_id]))
+            except json.JSONDecodeError as e:
+                # Reopen exactly what the reviewer typed, with the error above it
+                errors[kaomoji_id] = f"could not parse JSON: {e}"
+                raw_records[kaomoji_id] = edited[kaomoji_id]
+                failed.append((kaomoji_id, kaomoji_data))
+                continue
+            if edited_data.pop('delete', False):
+                decisions[kaomoji_id] = None
+            else:
+                decisions[kaomoji_id] = edited_data
+
+        if failed:
+            print(f"{len(failed)} kaomojis failed to parse and will be reopened")
+        to_edit = failed
+
+    for edited_data in decisions.values():
+        if edited_data is not None:
+            KEYWORDS.add(edited_data['species'], edited_data['emotion'])
+    return decisions
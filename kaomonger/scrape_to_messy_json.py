@@ -0,0 +1,467 @@
+
+import json
+import hashlib
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Iterable, Iterator, Tuple
+import sys
+import argparse
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from .instrument import STATS
+from .seen_index import SeenIndex
+from .workspace import ROOT_DIR
+
+# requests (and urllib3) are only imported by the download path, so
+# extracting from saved pages starts without them
+if TYPE_CHECKING:
+    import requests
+
+BASE_URL = "https://emojicombos.com"
+DIRTY_DIR = ROOT_DIR / "dirty_json"
+CACHE_DIR = ROOT_DIR / ".http_cache"
+CHUNK_SIZE = 64 * 1024
+
+
+class KaomojiHTMLParser(HTMLParser):
+    """
+    Incremental tokenizer that collects kaomoji containers from emojicombos.com pages.
+    
+    Feed it chunks of HTML as they arrive; completed records are queued and
+    can be drained with pop_records(). Attribute values are entity-decoded by
+    HTMLParser, so characters written as &#x..; references are kept.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._records = []
+    
+    def handle_starttag(self, tag: str, attrs: List[tuple]):
+        if tag != "div":
+            return
+        attributes = dict(attrs)
+        classes = (attributes.get("class") or "").split()
+        if "box-module" not in classes or "combo-ctn" not in classes:
+            return
+        if not all(attributes.get(name) is not None
+                   for name in ("data-combo-hash", "data-keyphrases", "data-combo")):
+            return
+        self._records.append(make_kaomoji_record(
+            attributes["data-combo-hash"], attributes["data-keyphrases"], attributes["data-combo"]))
+    
+    def pop_records(self) -> List[Dict[str, Any]]:
+        records, self._records = self._records, []
+        return records
+
+
+def make_kaomoji_record(combo_hash: str, keyphrases: str, content: str) -> Dict[str, Any]:
+    """
+    Build a kaomoji record from the decoded attributes of one container.
+    
+    Args:
+        combo_hash: Value of data-combo-hash
+        keyphrases: Comma separated user tags from data-keyphrases
+        content: The kaomoji itself from data-combo
+    """
+    content = content.strip()
+    
+    # Parse keyphrases into tags
+    tags = [tag.strip() for tag in keyphrases.split(',')]
+    
+    # Create unique ID by hashing the content
+    emoji_id = hashlib.md5(content.encode('utf-8')).hexdigest()
+    
+    return {
+        "emoji_id": emoji_id,
+        "content": content,
+        "tags": tags,
+        "combo_hash": combo_hash
+    }
+
+
+def iter_kaomoji(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield kaomoji records from HTML delivered in chunks.
+    
+    Memory stays bounded by the chunk size plus the largest single tag, so
+    records can be processed while the page is still downloading.
+    
+    Args:
+        chunks: Iterable of decoded HTML text chunks
+    """
+    parser = KaomojiHTMLParser()
+    for chunk in chunks:
+        with STATS.stage("extract"):
+            parser.feed(chunk)
+            records = parser.pop_records()
+        yield from records
+    with STATS.stage("extract"):
+        parser.close()
+        records = parser.pop_records()
+    yield from records
+
+
+def iter_file_chunks(file_path, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Read a UTF-8 text file in chunks."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def extract_kaomoji_from_html(html_content: str) -> List[Dict[str, Any]]:
+    """
+    Extract kaomoji data from emojicombos.com HTML content.
+    
+    Args:
+        html_content: Raw HTML content from emojicombos.com
+        
+    Returns:
+        List of dictionaries containing kaomoji data
+    """
+    return list(iter_kaomoji([html_content]))
+
+
+def process_html_file(file_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Process an HTML file and extract kaomoji data into the messy JSON format.
+    
+    Args:
+        file_path: Path to the HTML file
+        
+    Returns:
+        Dictionary with emoji_id as keys and kaomoji data as values
+    """
+    return build_messy_json(iter_kaomoji(iter_file_chunks(file_path)))
+
+
+def build_messy_json(kaomoji_list: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Convert extracted kaomoji into the messy JSON format.
+    
+    Args:
+        kaomoji_list: Kaomoji records from iter_kaomoji or extract_kaomoji_from_html
+        
+    Returns:
+        Dictionary with emoji_id as keys and kaomoji data as values
+    """
+    messy_json = {}
+    for kaomoji in kaomoji_list:
+        emoji_id = kaomoji["emoji_id"]
+        messy_json[emoji_id] = {
+            "content": kaomoji["content"],
+            "species": [],  # Will be populated later
+            "emotion": [],  # Will be populated later
+            "misc": kaomoji["tags"],  # All tags go to misc initially
+            "dotArt": False,  # Will be determined by regex later
+            "hasEmoji": False,  # Will be determined by regex later
+            "multiLine": "\n" in kaomoji["content"]  # Check for newlines
+        }
+    
+    return messy_json
+
+
+def save_messy_json(data: Dict[str, Dict[str, Any]], output_path: str):
+    """
+    Save the messy JSON data to a file.
+    
+    Args:
+        data: The kaomoji data dictionary
+        output_path: Path where to save the JSON file
+    """
+    with STATS.stage("write"):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            STATS.wrote_file(f.tell())
+
+
+class HttpCache:
+    """
+    On-disk cache of downloaded pages keyed by URL.
+    
+    Stores the body together with its ETag / Last-Modified validators so
+    re-runs can send conditional requests and skip unchanged pages.
+    """
+    
+    def __init__(self, cache_dir: Path = CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _paths(self, url: str):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.html", self.cache_dir / f"{key}.json"
+    
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return cached {'body_path', 'etag', 'last_modified'} for a URL, if any."""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not body_path.exists():
+            return None
+        meta["body_path"] = body_path
+        return meta
+    
+    def writer(self, url: str) -> "CacheWriter":
+        """Start writing a new body for a URL; it only replaces the old one on commit."""
+        body_path, meta_path = self._paths(url)
+        return CacheWriter(url, body_path, meta_path)
+
+
+class CacheWriter:
+    """Streams a response body into the cache, committed atomically once complete."""
+    
+    def __init__(self, url: str, body_path: Path, meta_path: Path):
+        self.url = url
+        self.body_path = body_path
+        self.meta_path = meta_path
+        self.tmp_path = body_path.with_name(f"{body_path.name}.{os.getpid()}.tmp")
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+    
+    def write(self, chunk: str):
+        self._file.write(chunk)
+    
+    def commit(self, etag: Optional[str], last_modified: Optional[str]):
+        self._file.close()
+        os.replace(self.tmp_path, self.body_path)
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump({"url": self.url, "etag": etag, "last_modified": last_modified}, f)
+    
+    def abort(self):
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def make_session(pool_size: int = 8, retries: int = 3, backoff: float = 0.5) -> "requests.Session":
+    """
+    Create a pooled session that retries transient failures with backoff.
+    
+    Args:
+        pool_size: Maximum number of pooled connections per host
+        retries: Retry attempts for connection errors and 429/5xx responses
+        backoff: Exponential backoff factor between retries, in seconds
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def stream_page(session: "requests.Session", url: str, cache: Optional[HttpCache] = None,
+                timeout: float = 30) -> Iterator[str]:
+    """
+    Download a page as decoded text chunks, revalidating against the cache.
+    
+    The body is streamed rather than loaded whole, and is teed into the cache
+    as it arrives. A 304 response replays the cached body instead.
+    
+    Args:
+        session: Session from make_session
+        url: Page to download
+        cache: Optional HttpCache; pages answered with 304 are served from it
+        timeout: Connect/read timeout in seconds
+        
+    Yields:
+        Chunks of the page HTML
+    """
+    cached = cache.get(url) if cache else None
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and cached:
+            STATS.count("cache_hits")
+            STATS.read_file(cached["body_path"], cached["body_path"].stat().st_size)
+            yield from iter_file_chunks(cached["body_path"])
+            return
+        response.raise_for_status()
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        
+        writer = cache.writer(url) if cache else None
+        try:
+            for chunk in STATS.timed("download", response.iter_content(CHUNK_SIZE, decode_unicode=True)):
+                STATS.count("bytes_downloaded", len(chunk.encode('utf-8')))
+                if writer:
+                    writer.write(chunk)
+                yield chunk
+        except BaseException:
+            if writer:
+                writer.abort()
+            raise
+        if writer:
+            writer.commit(response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+
+def scrape_category(session: "requests.Session", category: str, output_dir: Path,
+                    base_url: str = BASE_URL, cache: Optional[HttpCache] = None,
+                    timeout: float = 30, seen: Optional[SeenIndex] = None) -> Tuple[int, int]:
+    """
+    Download one category page and save its kaomoji to the dirty_json directory.
+    
+    Args:
+        seen: Optional SeenIndex; kaomoji already in cleaned/ are left out
+    
+    Returns:
+        Tuple of (kaomoji saved, already-cleaned kaomoji left out)
+        
+    Raises:
+        requests.RequestException: If the download fails
+        ValueError: If the page contains no kaomoji
+    """
+    url = urljoin(base_url.rstrip("/") + "/", category)
+    messy_json = build_messy_json(iter_kaomoji(stream_page(session, url, cache, timeout)))
+    if not messy_json:
+        raise ValueError("No kaomoji found in the HTML content. The page structure might have changed.")
+    
+    known = [emoji_id for emoji_id in messy_json if seen is not None and emoji_id in seen]
+    for emoji_id in known:
+        del messy_json[emoji_id]
+    STATS.count("entries", len(messy_json))
+    STATS.count("known", len(known))
+    
+    output_file = output_dir / f"{category}_kaomoji_messy.json"
+    if messy_json:
+        save_messy_json(messy_json, str(output_file))
+    return len(messy_json), len(known)
+
+
+def read_categories(args: argparse.Namespace) -> List[str]:
+    """Collect categories from the command line and --categories-file, without repeats."""
+    categories = list(args.category)
+    if args.categories_file:
+        with open(args.categories_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    categories.append(line)
+    return list(dict.fromkeys(category.lower() for category in categories))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download kaomoji from emojicombos.com and convert to JSON')
+    parser.add_argument('category', nargs='*', help='Category names (e.g., wolf, cat, happy)')
+    parser.add_argument('-f', '--categories-file', help='File with one category per line')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Concurrent downloads (default: 4)')
+    parser.add_argument('--base-url', default=BASE_URL, help='Site to scrape (default: %(default)s)')
+    parser.add_argument('--cache-dir', default=str(CACHE_DIR), help='HTTP response cache directory')
+    parser.add_argument('--no-cache', action='store_true', help='Always download pages in full')
+    parser.add_argument('--timeout', type=float, default=30, help='Request timeout in seconds')
+    parser.add_argument('--retries', type=int, default=3, help='Retries for failed requests')
+    parser.add_argument('--keep-known', action='store_true',
+                        help='Keep kaomoji already in cleaned/ so the cleaner can merge their tags')
+    parser.add_argument('--report', help='Write per-stage timings and counters to this JSON file')
+    parser.add_argument('--progress', action='store_true', help='Show a live progress line and a stage summary on stderr')
+    args = parser.parse_args()
+    
+    categories = read_categories(args)
+    if not categories:
+        parser.error("give at least one category or --categories-file")
+    
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    import requests
+    
+    # Create dirty_json directory if it doesn't exist
+    output_dir = DIRTY_DIR
+    output_dir.mkdir(exist_ok=True)
+    
+    cache = None if args.no_cache else HttpCache(Path(args.cache_dir))
+    seen = None if args.keep_known else SeenIndex()
+    jobs = max(1, min(args.jobs, len(categories)))
+    session = make_session(pool_size=jobs, retries=args.retries)
+    failures = []
+    
+    print(f"Downloading {len(categories)} categories from {args.base_url} ({jobs} at a time)...")
+    if args.progress:
+        STATS.start_progress(len(categories), "categories")
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(scrape_category, session, category, output_dir,
+                            args.base_url, cache, args.timeout, seen): category
+            for category in categories
+        }
+        for future in as_completed(futures):
+            category = futures[future]
+            STATS.advance()
+            try:
+                count, known = future.result()
+            except (requests.RequestException, ValueError) as e:
+                failures.append(category)
+                print(f"Error scraping {category}: {e}")
+                continue
+            if count:
+                print(f"Extracted {count} kaomoji and saved to {output_dir / f'{category}_kaomoji_messy.json'}")
+            if known:
+                print(f"  {category}: skipped {known} kaomoji already in cleaned/")
+    
+    session.close()
+    STATS.finish_progress()
+    STATS.count("failed_categories", len(failures))
+    if args.report:
+        STATS.write_report(args.report)
+        print(f"Timing report written to {args.report}")
+    if failures:
+        print(f"Failed categories: {', '.join(sorted(failures))}")
+        sys.exit(1)
+
+
+def extract_main():
+    parser = argparse.ArgumentParser(description='Extract kaomoji from saved emojicombos.com pages into messy JSON')
+    parser.add_argument('html_file', nargs='+', help='Saved HTML page(s)')
+    parser.add_argument('-o', '--output-dir', default=str(DIRTY_DIR),
+                        help='Directory for the messy JSON files (default: dirty_json/)')
+    parser.add_argument('--keep-known', action='store_true',
+                        help='Keep kaomoji already in cleaned/ so the cleaner can merge their tags')
+    args = parser.parse_args()
+    
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(exist_ok=True)
+    seen = None if args.keep_known else SeenIndex()
+    failures = []
+    for html_file in args.html_file:
+        try:
+            messy_json = process_html_file(html_file)
+        except OSError as e:
+            failures.append(html_file)
+            print(f"Error reading {html_file}: {e}")
+            continue
+        if not messy_json:
+            failures.append(html_file)
+            print(f"No kaomoji found in {html_file}")
+            continue
+        known = [emoji_id for emoji_id in messy_json if seen is not None and emoji_id in seen]
+        for emoji_id in known:
+            del messy_json[emoji_id]
+        output_file = output_dir / f"{Path(html_file).stem}_kaomoji_messy.json"
+        if messy_json:
+            save_messy_json(messy_json, str(output_file))
+            print(f"Extracted {len(messy_json)} kaomoji and saved to {output_file}")
+        if known:
+            print(f"  {html_file}: skipped {len(known)} kaomoji already in cleaned/")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+'''
+Kaomoji Search Daemon
+Keeps the search index and the ranked tag index open and answers
+find_kaomoji.zsh over a Unix socket, so a search never starts cold
+
+cleaned/ is polled for changed files between requests; SearchIndex.refresh
+only re-reads files whose mtime or size changed. A refresh that fails (say,
+on a half-written shard) is rolled back and logged, and the last good index
+keeps being served until a later poll succeeds.
+
+Protocol: one tab-separated request line per connection
+    query [name=value ...] [tag ...]     rows of SearchIndex.query
+    rank  [name=value ...] term ...      rows of the ranked tag search
+    ping
+where name is source, kind, limit or a flag (dotArt/hasEmoji/multiLine with
+true|false). The reply starts with an "OK" or "ERROR <message>" line,
+followed by the TSV rows; the daemon closes the connection when done.
+'''
+import argparse
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+from pathlib import Path
+
+from .search_index import DEFAULT_SOURCE, FLAG_BITS, INDEX_NAME, TAG_KINDS, SearchIndex
+from .tag_search import load_tag_index
+
+POLL_INTERVAL = 1.0
+
+
+def default_socket_path():
+    """$KAOMONGER_SOCKET, or a per-user socket in $XDG_RUNTIME_DIR (or /tmp)"""
+    if os.environ.get('KAOMONGER_SOCKET'):
+        return Path(os.environ['KAOMONGER_SOCKET'])
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return Path(runtime_dir) / f'kaomonger-{os.getuid()}.sock'
+
+
+class RequestError(ValueError):
+    pass
+
+
+def parse_request(line):
+    """Split a request line into (command, options, words)"""
+    fields = [field for field in line.rstrip('\n').split('\t') if field]
+    if not fields:
+        raise RequestError("empty request")
+    command, options, words = fields[0], {}, []
+    for field in fields[1:]:
+        name, sep, value = field.partition('=')
+        if sep and (name in FLAG_BITS or name in ('source', 'kind', 'limit')):
+            options[name] = value
+        else:
+            words.append(field)
+    return command, options, words
+
+
+def request_flags(options):
+    flags = {}
+    for name in FLAG_BITS:
+        if name in options:
+            if options[name] not in ('true', 'false'):
+                raise RequestError(f"{name} must be true or false")
+            flags[name] = options[name] == 'true'
+    return flags
+
+
+class SearchHandler(socketserver.StreamRequestHandler):
+    # Rows are small; unbuffered writes would cost a syscall each
+    wbufsize = 1 << 16
+
+    def handle(self):
+        try:
+            line = self.rfile.readline().decode('utf-8')
+            rows = self.server.answer(*parse_request(line))
+            self.wfile.write(b'OK\n')
+            for row in rows:
+                self.wfile.write(row.encode('utf-8') + b'\n')
+        except RequestError as e:
+            self.wfile.write(f"ERROR {e}\n".encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError):
+            # The client (usually fzf's pipeline) went away early
+            pass
+
+
+class SearchServer(socketserver.UnixStreamServer):
+    """Single-threaded server; polling happens between requests"""
+
+    def __init__(self, socket_path, source_dir, poll_interval=POLL_INTERVAL):
+        self.source_dir = Path(source_dir).resolve()
+        self.index = SearchIndex(self.source_dir, self.source_dir / INDEX_NAME)
+        self.poll_interval = poll_interval
+        self._refresh_error = None
+        self.refresh()
+        super().__init__(str(socket_path), SearchHandler)
+
+    def refresh(self):
+        try:
+            changed = self.index.refresh()
+        except Exception as e:
+            # Reported once per distinct failure, not on every poll
+            error = f"{type(e).__name__}: {e}"
+            if error != self._refresh_error:
+                print(f"Warning: re-indexing failed, serving the last good index: {error}", file=sys.stderr)
+                self._refresh_error = error
+        else:
+            if changed:
+                print(f"Re-indexed {changed} changed files", file=sys.stderr)
+            self._refresh_error = None
+        self._last_poll = time.monotonic()
+
+    def service_actions(self):
+        if time.monotonic() - self._last_poll >= self.poll_interval:
+            self.refresh()
+
+    def answer(self, command, options, words):
+        """Rows for one request"""
+        if 'source' in options and Path(options['source']).resolve() != self.source_dir:
+            raise RequestError(f"serving {self.source_dir}, not {options['source']}")
+        kind = options.get('kind')
+        if kind is not None and kind not in TAG_KINDS:
+            raise RequestError(f"unknown kind {kind}")
+        try:
+            limit = int(options['limit']) if 'limit' in options else None
+        except ValueError:
+            raise RequestError("limit must be a number")
+        flags = request_flags(options)
+
+        # Never answer from an index older than the poll interval
+        self.service_actions()
+        if command == 'ping':
+            return []
+        if command == 'query':
+            rows = self.index.query(flags, words, kind)
+            return rows if limit is None else (row for _, row in zip(range(limit), rows))
+        if command == 'rank':
+            ranked = load_tag_index(self.index).rank(words, kind)
+            return self.index.rows(ranked, flags, limit)
+        raise RequestError(f"unknown command {command}")
+
+    def server_close(self):
+        super().server_close()
+        self.index.close()
+
+
+def socket_in_use(socket_path):
+    """True if another daemon answers on the socket"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve kaomoji searches over a Unix socket')
+    parser.add_argument('-s', '--source', default=str(DEFAULT_SOURCE),
+                        help='Directory of cleaned JSON files')
+    parser.add_argument('--socket', default=str(default_socket_path()),
+                        help='Socket path (default: %(default)s)')
+    parser.add_argument('--poll', type=float, default=POLL_INTERVAL,
+                        help='Seconds between checks of the cleaned files (default: %(default)s)')
+    args = parser.parse_args()
+
+    socket_path = Path(args.socket)
+    if socket_path.exists():
+        if socket_in_use(socket_path):
+            print(f"Error: a search daemon is already listening on {socket_path}")
+            sys.exit(1)
+        # Left behind by a daemon that did not shut down cleanly
+        socket_path.unlink()
+
+    server = SearchServer(socket_path, args.source, args.poll)
+    os.chmod(socket_path, 0o600)
+    print(f"Serving {server.source_dir} on {socket_path}", file=sys.stderr)
+    # Let `kill` remove the socket too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever(poll_interval=min(args.poll, 0.5))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+'''
+Kaomoji Search Index
+SQLite index over the cleaned corpus for find_kaomoji.zsh
+
+Each cleaned/cleaned_kaomoji_*.json shard is indexed once and only re-read
+when its mtime or size changes. Queries filter on a flag bitmask and an inverted tag table and
+stream the same TSV rows the jq pipeline used to produce.
+'''
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+from .workspace import CLEANED_DIR
+
+INDEX_NAME = '.search_index.sqlite'
+SHARD_PATTERN = 'cleaned_kaomoji_*.json'
+
+# Bump when the schema or the TSV row layout changes
+SCHEMA_VERSION = 1
+
+# Bit positions for the boolean filters
+FLAG_BITS = {
+    'dotArt': 1,
+    'hasEmoji': 2,
+    'multiLine': 4,
+}
+
+TAG_KINDS = ('species', 'emotion', 'misc')
+
+# Entries fetched per query by rows(), kept below SQLite's parameter limit
+ROW_BATCH = 500
+
+DEFAULT_SOURCE = CLEANED_DIR
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def tsv_field(value):
+    """Escape a field the way jq's @tsv does"""
+    return value.translate(_TSV_ESCAPES)
+
+
+def tsv_row(kaomoji_id, entry):
+    """Row layout consumed by the fzf call in find_kaomoji.zsh"""
+    return '\t'.join([
+        tsv_field(kaomoji_id),
+        tsv_field("🐾 " + ', '.join(entry.get('species', []))),
+        tsv_field("💖 " + ', '.join(entry.get('emotion', []))),
+        tsv_field("✨ " + ', '.join(entry.get('misc', []))),
+        tsv_field(entry.get('content', '')),
+    ])
+
+
+def entry_flags(entry):
+    return sum(bit for name, bit in FLAG_BITS.items() if entry.get(name))
+
+
+class SearchIndex:
+    """Incrementally maintained index for one directory of cleaned JSON files"""
+
+    def __init__(self, source_dir=DEFAULT_SOURCE, index_path=None):
+        self.source_dir = Path(source_dir)
+        self.index_path = Path(index_path) if index_path else self.source_dir / INDEX_NAME
+        self.conn = sqlite3.connect(self.index_path)
+        self._init_schema()
+
+    def _init_schema(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.executescript('''
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS entries;
+                DROP TABLE IF EXISTS tags;
+            ''')
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS files (
+                name TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                file TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                emoji_id TEXT NOT NULL,
+                flags INTEGER NOT NULL,
+                tsv TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_file ON entries (file, position);
+            CREATE INDEX IF NOT EXISTS entries_emoji_id ON entries (emoji_id);
+            CREATE TABLE IF NOT EXISTS tags (
+                tag TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                entry INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag, kind);
+            CREATE INDEX IF NOT EXISTS tags_entry ON tags (entry);
+            PRAGMA user_version = {SCHEMA_VERSION};
+        ''')
+
+    def refresh(self):
+        """Re-index only the cleaned files that were added, changed or removed"""
+        on_disk = {}
+        for path in self.source_dir.glob(SHARD_PATTERN):
+            stat = path.stat()
+            on_disk[path.name] = (stat.st_mtime_ns, stat.st_size)
+        indexed = {name: (mtime_ns, size) for name, mtime_ns, size
+                   in self.conn.execute('SELECT name, mtime_ns, size FROM files')}
+
+        stale = [name for name in indexed if on_disk.get(name) != indexed[name]]
+        fresh = [name for name in on_disk if indexed.get(name) != on_disk[name]]
+        if not stale and not fresh:
+            return 0
+
+        with self.conn:
+            for name in stale:
+                self._drop_file(name)
+            for name in sorted(fresh):
+                self._index_file(name, *on_disk[name])
+        return len(fresh)
+
+    def _drop_file(self, name):
+        self.conn.execute('DELETE FROM tags WHERE entry IN (SELECT id FROM entries WHERE file = ?)', (name,))
+        self.conn.execute('DELETE FROM entries WHERE file = ?', (name,))
+        self.conn.execute('DELETE FROM files WHERE name = ?', (name,))
+
+    def _index_file(self, name, mtime_ns, size):
+        try:
+            with open(self.source_dir / name, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: skipping {name}: {e}", file=sys.stderr)
+            data = {}
+
+        for position, (kaomoji_id, entry) in enumerate(data.items()):
+            cursor = self.conn.execute(
+                'INSERT INTO entries (file, position, emoji_id, flags, tsv) VALUES (?, ?, ?, ?, ?)',
+                (name, position, kaomoji_id, entry_flags(entry), tsv_row(kaomoji_id, entry)))
+            self.conn.executemany(
+                'INSERT INTO tags (tag, kind, entry) VALUES (?, ?, ?)',
+                {(tag.casefold(), kind, cursor.lastrowid)
+                 for kind in TAG_KINDS for tag in entry.get(kind, [])})
+        self.conn.execute('INSERT OR REPLACE INTO files (name, mtime_ns, size) VALUES (?, ?, ?)',
+                          (name, mtime_ns, size))
+
+    def query(self, flags=None, tags=(), kind=None):
+        """Yield TSV rows matching the flag filters and every given tag
+
+        Args:
+            flags: mapping of flag name to required bool; missing flags are not filtered
+            tags: tags that must all be present (case-insensitive)
+            kind: restrict tag matching to species, emotion or misc
+        """
+        mask = want = 0
+        for name, required in (flags or {}).items():
+            mask |= FLAG_BITS[name]
+            if required:
+                want |= FLAG_BITS[name]
+
+        sql = 'SELECT tsv FROM entries WHERE (flags & ?) = ?'
+        params = [mask, want]
+        for tag in tags:
+            sql += ' AND id IN (SELECT entry FROM tags WHERE tag = ?'
+            params.append(tag.casefold())
+            if kind:
+                sql += ' AND kind = ?'
+                params.append(kind)
+            sql += ')'
+        sql += ' ORDER BY file, position'
+
+        for (tsv,) in self.conn.execute(sql, params):
+            yield tsv
+
+    def rows(self, entry_ids, flags=None, limit=None):
+        """Yield the TSV rows of the given entries, in the given order
+
+        Args:
+            entry_ids: entry ids as stored in the tags table
+            flags: mapping of flag name to required bool, as for query()
+            limit: stop after this many rows
+        """
+        mask = want = 0
+        for name, required in (flags or {}).items():
+            mask |= FLAG_BITS[name]
+            if required:
+                want |= FLAG_BITS[name]
+
+        emitted = 0
+        for start in range(0, len(entry_ids), ROW_BATCH):
+            batch = entry_ids[start:start + ROW_BATCH]
+            found = dict(self.conn.execute(
+                f"SELECT id, tsv FROM entries WHERE (flags & ?) = ? AND id IN ({', '.join('?' * len(batch))})",
+                [mask, want, *batch]))
+            for entry_id in batch:
+                if entry_id in found:
+                    yield found[entry_id]
+                    emitted += 1
+                    if limit is not None and emitted >= limit:
+                        return
+
+    def row(self, kaomoji_id):
+        """TSV row of one kaomoji (from the newest file holding it), or None"""
+        found = self.conn.execute(
+            'SELECT tsv FROM entries WHERE emoji_id = ? ORDER BY file DESC, position DESC LIMIT 1',
+            (kaomoji_id,)).fetchone()
+        return found[0] if found else None
+
+    def close(self):
+        self.conn.close()
+
+
+def parse_bool(value):
+    if value not in ('true', 'false'):
+        raise argparse.ArgumentTypeError("expected 'true' or 'false'")
+    return value == 'true'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the cleaned kaomoji corpus as TSV')
+    parser.add_argument('-s', '--source', default=str(DEFAULT_SOURCE),
+                        help='Directory of cleaned JSON files')
+    for name in FLAG_BITS:
+        parser.add_argument(f'--{name}', type=parse_bool, metavar='true|false',
+                            help=f'Filter on {name}')
+    parser.add_argument('-t', '--tag', action='append', default=[],
+                        help='Only entries carrying this tag (repeatable)')
+    parser.add_argument('--kind', choices=TAG_KINDS, help='Restrict --tag to one tag list')
+    parser.add_argument('--rebuild', action='store_true', help='Drop and rebuild the index')
+    args = parser.parse_args()
+
+    index_path = Path(args.source) / INDEX_NAME
+    if args.rebuild and index_path.exists():
+        os.remove(index_path)
+
+    index = SearchIndex(args.source, index_path)
+    try:
+        index.refresh()
+        flags = {name: getattr(args, name) for name in FLAG_BITS if getattr(args, name) is not None}
+        out = sys.stdout
+        for row in index.query(flags, args.tag, args.kind):
+            out.write(row + '\n')
+        out.flush()
+    except BrokenPipeError:
+        # fzf exited before reading everything
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+'''
+Seen Kaomoji Index
+Persistent set of every emoji_id already in cleaned/, consulted by the
+scraper and the cleaner so known kaomoji never re-enter manual review
+
+The ids are stored as a sorted array of 16-byte MD5 digests (binary searched
+in place) plus a manifest of the shards they came from. New shards are folded
+in incrementally; a modified or removed shard triggers a full rebuild.
+'''
+import hashlib
+import json
+import os
+from bisect import bisect_left
+from pathlib import Path
+
+from .workspace import CLEANED_DIR
+
+IDS_NAME = '.seen_ids.bin'
+# Not *.json, so nothing globbing the cleaned directory mistakes it for a shard
+MANIFEST_NAME = '.seen_ids.manifest'
+LEGACY_MANIFEST_NAME = '.seen_ids.json'
+DIGEST_SIZE = 16
+
+
+def id_digest(emoji_id):
+    """16-byte digest for an emoji_id (the hex MD5 of its content)"""
+    try:
+        digest = bytes.fromhex(emoji_id)
+    except ValueError:
+        digest = b''
+    if len(digest) != DIGEST_SIZE:
+        digest = hashlib.md5(emoji_id.encode('utf-8')).digest()
+    return digest
+
+
+class _DigestArray:
+    """Read-only sequence view over concatenated fixed-size digests"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // DIGEST_SIZE
+
+    def __getitem__(self, i):
+        start = i * DIGEST_SIZE
+        return self.data[start:start + DIGEST_SIZE]
+
+
+class SeenIndex:
+    """Membership test for emoji_ids that have already been cleaned"""
+
+    def __init__(self, cleaned_dir=CLEANED_DIR):
+        self.cleaned_dir = Path(cleaned_dir)
+        self.ids_path = self.cleaned_dir / IDS_NAME
+        self.manifest_path = self.cleaned_dir / MANIFEST_NAME
+        self._sorted = _DigestArray(b'')
+        # Ids seen this session that are not in a cleaned shard yet
+        self._recent = set()
+        self.refresh()
+
+    def __contains__(self, emoji_id):
+        digest = id_digest(emoji_id)
+        return digest in self._recent or self._in_sorted(digest)
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent)
+
+    def add(self, emoji_id):
+        self._recent.add(id_digest(emoji_id))
+
+    def _shards(self):
+        shards = {}
+        for path in sorted(self.cleaned_dir.glob('cleaned_kaomoji_*.json')):
+            stat = path.stat()
+            shards[path.name] = [stat.st_mtime_ns, stat.st_size]
+        return shards
+
+    def refresh(self):
+        """Bring the on-disk index up to date with the cleaned shards"""
+        shards = self._shards()
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                recorded = json.load(f)
+            data = self.ids_path.read_bytes()
+        except (OSError, json.JSONDecodeError):
+            recorded, data = {}, b''
+
+        if any(shards.get(name) != stamp for name, stamp in recorded.items()):
+            recorded, data = {}, b''
+
+        new_shards = [name for name in shards if name not in recorded]
+        if new_shards:
+            digests = {data[i:i + DIGEST_SIZE] for i in range(0, len(data), DIGEST_SIZE)}
+            for name in new_shards:
+                with open(self.cleaned_dir / name, 'r', encoding='utf-8') as f:
+                    digests.update(id_digest(emoji_id) for emoji_id in json.load(f))
+            data = b''.join(sorted(digests))
+            self._save(data, {name: shards[name] for name in shards})
+
+        self._sorted = _DigestArray(data)
+        self._recent = {digest for digest in self._recent if not self._in_sorted(digest)}
+
+    def _in_sorted(self, digest):
+        i = bisect_left(self._sorted, digest)
+        return i < len(self._sorted) and self._sorted[i] == digest
+
+    def _save(self, data, manifest):
+        try:
+            tmp_path = self.ids_path.with_name(self.ids_path.name + '.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, self.ids_path)
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            (self.cleaned_dir / LEGACY_MANIFEST_NAME).unlink(missing_ok=True)
+        except OSError:
+            # Read-only corpus; the in-memory index is still correct
+            pass
+
+
+if __name__ == '__main__':
+    index = SeenIndex()
+    print(f"{len(index)} cleaned kaomoji ids indexed in {index.ids_path}")
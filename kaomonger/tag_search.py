@@ -0,0 +1,416 @@
+'''
+Ranked Tag Search
+Typo-tolerant, ranked lookup of kaomoji by tag over the cleaned corpus, and
+tag suggestions for review
+
+Built from the tags table of the SQLite search index and cached in
+cleaned/.tag_index.bin until a cleaned file changes:
+  - trigram index over tag names; candidates are scored by trigram overlap
+    and confirmed with a bounded edit distance
+  - posting lists of entries per tag; popularity is the posting length
+  - the most strongly co-occurring tags of every tag
+Entries are scored by how well their tags match each query term, weighted by
+how rare the tag is; co-occurring tags extend a term at a reduced weight.
+'''
+import argparse
+import marshal
+import math
+import os
+import sys
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from .keywords import fold
+from .search_index import DEFAULT_SOURCE, FLAG_BITS, INDEX_NAME, TAG_KINDS, SearchIndex, parse_bool
+
+TAG_INDEX_NAME = '.tag_index.bin'
+
+# Bump when the cached layout changes so stale files are rebuilt
+TAG_INDEX_FORMAT = 1
+
+KIND_BITS = {kind: 1 << i for i, kind in enumerate(TAG_KINDS)}
+MIN_SIMILARITY = 0.5
+MAX_CANDIDATES = 40
+COOCCURRING_KEPT = 16
+EXPANSION_TAGS = 3
+EXPANSION_WEIGHT = 0.25
+EXPAND_BELOW = 50
+
+# Added once per directly matched term, so entries matching more terms rank first
+MATCH_BONUS = 1000.0
+
+_loaded_indexes = {}
+
+
+def trigrams(text):
+    padded = f'${text}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} or {padded}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 once it is certain to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def similarity(term, tag):
+    """1.0 for an exact match, lower for prefixes, typos and partial overlaps"""
+    if term == tag:
+        return 1.0
+    if tag.startswith(term) or term.startswith(tag):
+        return 0.9 * min(len(term), len(tag)) / max(len(term), len(tag)) + 0.1
+    grams_term, grams_tag = trigrams(term), trigrams(tag)
+    dice = 2 * len(grams_term & grams_tag) / (len(grams_term) + len(grams_tag))
+    limit = 1 if len(term) <= 5 else 2
+    distance = edit_distance(term, tag, limit)
+    if distance <= limit:
+        dice = max(dice, 1 - distance / max(len(term), len(tag)))
+    return dice
+
+
+def _numbers(blob):
+    """Zero-copy view of packed unsigned ints"""
+    return memoryview(blob).cast('I')
+
+
+class PackedLists:
+    """List of integer lists stored as one offsets array and one values array"""
+
+    def __init__(self, offsets, values):
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def pack(cls, lists):
+        offsets = array('I', [0])
+        values = array('I')
+        for numbers in lists:
+            values.extend(numbers)
+            offsets.append(len(values))
+        return cls(offsets, values)
+
+    @classmethod
+    def from_bytes(cls, offsets, values):
+        return cls(_numbers(offsets), _numbers(values))
+
+    def to_bytes(self):
+        return bytes(self.offsets), bytes(self.values)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def length(self, i):
+        return self.offsets[i + 1] - self.offsets[i]
+
+
+class TrigramMatcher:
+    """Fuzzy lookup over a fixed list of (folded) strings"""
+
+    def __init__(self, names, grams=None):
+        self.names = names
+        if grams is None:
+            numbers_by_gram = defaultdict(lambda: array('I'))
+            for number, name in enumerate(names):
+                for gram in trigrams(name):
+                    numbers_by_gram[gram].append(number)
+            grams = {gram: numbers.tobytes() for gram, numbers in numbers_by_gram.items()}
+        # Trigram to the packed numbers of the names containing it
+        self.grams = grams
+
+    def match(self, term, min_similarity=MIN_SIMILARITY):
+        """List of (name number, similarity), best first"""
+        term = fold(term)
+        shared = Counter()
+        for gram in trigrams(term):
+            if gram in self.grams:
+                shared.update(_numbers(self.grams[gram]))
+        scored = []
+        for number, _ in shared.most_common(MAX_CANDIDATES):
+            score = similarity(term, self.names[number])
+            if score >= min_similarity:
+                scored.append((number, score))
+        scored.sort(key=lambda item: -item[1])
+        return scored
+
+
+class TagIndex:
+    """Tags of the cleaned corpus with postings, popularity and co-occurrence
+
+    Postings and co-occurrence lists are packed arrays, so loading the cached
+    index does not create a Python object per entry.
+    """
+
+    def __init__(self, names, kinds, postings, cooccurring, cooccurring_counts, entry_count, grams=None):
+        self.names = names
+        self.kinds = kinds
+        self.postings = postings
+        self.cooccurring = cooccurring
+        self.cooccurring_counts = cooccurring_counts
+        self.entry_count = entry_count
+        self.numbers = {name: number for number, name in enumerate(names)}
+        self.matcher = TrigramMatcher(names, grams)
+        self._posting_sets = {}
+
+    def popularity(self, number):
+        return self.postings.length(number)
+
+    def _posting_set(self, number):
+        """Entries of a tag as a set, kept for the life of the index"""
+        posting = self._posting_sets.get(number)
+        if posting is None:
+            posting = self._posting_sets[number] = frozenset(self.postings[number])
+        return posting
+
+    def _kind_matches(self, number, kind):
+        return not kind or self.kinds[number] & KIND_BITS[kind]
+
+    def _cooccurring(self, number):
+        return zip(self.cooccurring[number], self.cooccurring_counts[number])
+
+    def lookup(self, term, kind=None, limit=10):
+        """Tags closest to a possibly misspelled term, weighted by popularity
+
+        Returns:
+            List of (tag, similarity, popularity)
+        """
+        results = [(number, score) for number, score in self.matcher.match(term)
+                   if self._kind_matches(number, kind)]
+        results.sort(key=lambda item: -(item[1] * (1 + math.log1p(self.popularity(item[0])) / 10)))
+        return [(self.names[number], score, self.popularity(number)) for number, score in results[:limit]]
+
+    def related(self, tags, kind=None, limit=10):
+        """Tags that most often appear together with the given tags
+
+        Scored by co-occurrence count normalized by both tags' popularity, so
+        tags that are everywhere do not crowd out specific ones.
+        """
+        given = {self.numbers[fold(tag)] for tag in tags if fold(tag) in self.numbers}
+        scores = defaultdict(float)
+        for number in given:
+            for other, count in self._cooccurring(number):
+                if other in given or not self._kind_matches(other, kind):
+                    continue
+                scores[other] += count / math.sqrt(self.popularity(number) * self.popularity(other))
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [(self.names[number], score) for number, score in ranked]
+
+    def _term_groups(self, term, kind):
+        """Disjoint (score, entry set) groups for one query term, best first"""
+        weights = {number: score for number, score in self.matcher.match(term)
+                   if self._kind_matches(number, kind)}
+        direct = set(weights)
+        if sum(self.popularity(number) for number in direct) < EXPAND_BELOW:
+            for number, score in list(weights.items())[:EXPANSION_TAGS]:
+                for other, count in list(self._cooccurring(number))[:EXPANSION_TAGS]:
+                    strength = count / math.sqrt(self.popularity(number) * self.popularity(other))
+                    expanded = score * EXPANSION_WEIGHT * strength
+                    if other not in direct and expanded > weights.get(other, 0.0):
+                        weights[other] = expanded
+
+        # Best tag first, so each entry lands in the group of its best matching tag
+        valued = sorted(((weight * math.log1p(self.entry_count / self.popularity(number))
+                          + (MATCH_BONUS if number in direct else 0.0), number)
+                         for number, weight in weights.items()), reverse=True)
+        groups = []
+        covered = set()
+        for value, number in valued:
+            fresh = self._posting_set(number) - covered
+            if fresh:
+                groups.append((value, fresh))
+                covered |= fresh
+        return groups, covered
+
+    def rank(self, terms, kind=None):
+        """Entry ids matching the query terms, best first
+
+        Entries matching more terms always rank above entries matching fewer
+        (a tag reached only through co-occurrence does not count as a match);
+        within that, tag similarity times rarity decides. Terms with only a
+        handful of matches are extended with their co-occurring tags.
+
+        Scores are kept per group of entries that matched the same tags, so the
+        work is set operations rather than per-entry Python loops.
+        """
+        groups, covered = [], set()
+        for term_number, term in enumerate(terms):
+            term_groups, term_covered = self._term_groups(term, kind)
+            if term_number == 0:
+                groups, covered = term_groups, term_covered
+                continue
+            combined = []
+            for value, rest in groups:
+                for term_value, term_entries in term_groups:
+                    both = rest & term_entries
+                    if both:
+                        combined.append((value + term_value, both))
+                        rest -= both
+                if rest:
+                    combined.append((value, rest))
+            for term_value, term_entries in term_groups:
+                only = term_entries - covered
+                if only:
+                    combined.append((term_value, only))
+            groups = combined
+            covered |= term_covered
+
+        groups.sort(key=lambda group: -group[0])
+        ranked = []
+        for _, entries in groups:
+            ranked.extend(entries)
+        return ranked
+
+
+def build_tag_index(conn):
+    """Collect tag postings and co-occurrence from a search index connection"""
+    numbers = {}
+    names = []
+    kinds = bytearray()
+    postings = []
+    entry_tags = defaultdict(set)
+    for tag, kind, entry in conn.execute('SELECT tag, kind, entry FROM tags ORDER BY entry'):
+        number = numbers.get(tag)
+        if number is None:
+            number = numbers[tag] = len(names)
+            names.append(tag)
+            kinds.append(0)
+            postings.append([])
+        kinds[number] |= KIND_BITS[kind]
+        if not postings[number] or postings[number][-1] != entry:
+            postings[number].append(entry)
+        entry_tags[entry].add(number)
+
+    pair_counts = [Counter() for _ in names]
+    for tag_numbers in entry_tags.values():
+        for number in tag_numbers:
+            pair_counts[number].update(tag_numbers)
+    # Keep the partners with the highest count relative to both tags' popularity;
+    # raw counts would favour the handful of tags found on every entry
+    top_pairs = []
+    for number, counts in enumerate(pair_counts):
+        del counts[number]
+        ranked = sorted(counts.items(), key=lambda item: -item[1] / math.sqrt(len(postings[item[0]])))
+        top_pairs.append(ranked[:COOCCURRING_KEPT])
+
+    return TagIndex(
+        names, bytes(kinds), PackedLists.pack(postings),
+        PackedLists.pack([other for other, _ in pairs] for pairs in top_pairs),
+        PackedLists.pack([count for _, count in pairs] for pairs in top_pairs),
+        len(entry_tags))
+
+
+def _index_stamp(conn):
+    return tuple(conn.execute('SELECT name, mtime_ns, size FROM files ORDER BY name'))
+
+
+def load_tag_index(search_index):
+    """Tag index for a refreshed SearchIndex, rebuilt only when its files changed"""
+    stamp = _index_stamp(search_index.conn)
+    cached = _loaded_indexes.get(search_index.source_dir)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    cache_path = search_index.source_dir / TAG_INDEX_NAME
+    try:
+        saved = marshal.loads(cache_path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        saved = None
+    if saved and saved[0] == TAG_INDEX_FORMAT and saved[1] == stamp:
+        _, _, names, kinds, postings, cooccurring, cooccurring_counts, entry_count, grams = saved
+        index = TagIndex(names, kinds, PackedLists.from_bytes(*postings), PackedLists.from_bytes(*cooccurring),
+                         PackedLists.from_bytes(*cooccurring_counts), entry_count, grams)
+    else:
+        index = build_tag_index(search_index.conn)
+        try:
+            tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+            tmp_path.write_bytes(marshal.dumps((
+                TAG_INDEX_FORMAT, stamp, index.names, index.kinds, index.postings.to_bytes(),
+                index.cooccurring.to_bytes(), index.cooccurring_counts.to_bytes(),
+                index.entry_count, index.matcher.grams)))
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # Read-only corpus; the in-memory index is still correct
+            pass
+    _loaded_indexes[search_index.source_dir] = (stamp, index)
+    return index
+
+
+def suggest_tags(misc_tags, keyword_list, kind, tag_index=None, limit=5):
+    """Keyword suggestions for a kaomoji under review
+
+    Combines typo-tolerant matches of its misc tags against a keyword list
+    with the keywords that co-occur with those tags in the cleaned corpus.
+    """
+    keywords = keyword_list.sorted_tags()
+    folded = [fold(tag) for tag in keywords]
+    matcher = TrigramMatcher(folded)
+    scores = defaultdict(float)
+    for tag in misc_tags:
+        for number, score in matcher.match(tag, min_similarity=0.7):
+            scores[number] = max(scores[number], score)
+    if tag_index is not None:
+        positions = {name: number for number, name in enumerate(folded)}
+        for name, score in tag_index.related(misc_tags, kind=kind, limit=limit * 2):
+            if name in positions:
+                scores[positions[name]] += min(score, 1.0) * 0.5
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    return [keywords[number] for number, _ in ranked[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ranked, typo-tolerant kaomoji search by tag')
+    parser.add_argument('terms', nargs='*', help='Tags to search for (misspellings allowed)')
+    parser.add_argument('-s', '--source', default=str(DEFAULT_SOURCE),
+                        help='Directory of cleaned JSON files')
+    for name in FLAG_BITS:
+        parser.add_argument(f'--{name}', type=parse_bool, metavar='true|false',
+                            help=f'Filter on {name}')
+    parser.add_argument('--kind', choices=TAG_KINDS, help='Only match tags of this kind')
+    parser.add_argument('-n', '--limit', type=int, help='Print at most this many rows')
+    parser.add_argument('--lookup', action='store_true',
+                        help='Print the closest tags for each term instead of kaomoji')
+    parser.add_argument('--related', action='store_true',
+                        help='Print the tags that most often appear with the terms')
+    args = parser.parse_args()
+
+    search_index = SearchIndex(args.source, Path(args.source) / INDEX_NAME)
+    try:
+        search_index.refresh()
+        tag_index = load_tag_index(search_index)
+        out = sys.stdout
+        if args.lookup:
+            for term in args.terms:
+                for tag, score, popularity in tag_index.lookup(term, args.kind, args.limit or 10):
+                    out.write(f"{term}\t{tag}\t{score:.2f}\t{popularity}\n")
+        elif args.related:
+            for tag, score in tag_index.related(args.terms, args.kind, args.limit or 10):
+                out.write(f"{tag}\t{score:.3f}\n")
+        else:
+            flags = {name: getattr(args, name) for name in FLAG_BITS if getattr(args, name) is not None}
+            ranked = tag_index.rank(args.terms, args.kind) if args.terms else []
+            for row in search_index.rows(ranked, flags, args.limit):
+                out.write(row + '\n')
+        out.flush()
+    except BrokenPipeError:
+        # fzf exited before reading everything
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    finally:
+        search_index.close()
+
+
+if __name__ == '__main__':
+    main()
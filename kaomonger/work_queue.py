@@ -0,0 +1,304 @@
+'''
+Cleaning Work Queue
+SQLite queue of the kaomoji the cleaner reviews, so an interrupted session
+resumes exactly where it stopped without redoing any human work
+
+Every item moves pending -> pretagged -> reviewed | deleted | known. A review
+decision is committed in a single transaction together with the rest of its
+near-duplicate cluster. Reviewed items belong to a session and are written to
+that session's cleaned shard when it is exported; deleted items stay behind as
+tombstones so a skipped kaomoji is not offered again when it is re-scraped.
+Known items were already cleaned and had no new tags to merge; they are
+dropped on export, so a later scrape of the same kaomoji is queued again.
+
+A kaomoji scraped into several dirty files (overlapping categories) is one
+item: the first file's copy is queued and the misc tags of the others are
+folded into it. Which files hold which ids is tracked separately, so a
+decision clears the kaomoji out of every file it came from.
+'''
+import argparse
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+from .compact_corpus import merge_tags
+from .instrument import STATS
+from .workspace import ROOT_DIR
+
+QUEUE_PATH = ROOT_DIR / 'work_queue.sqlite'
+
+# Bump when the schema changes
+SCHEMA_VERSION = 2
+
+PENDING = 'pending'
+PRETAGGED = 'pretagged'
+REVIEWED = 'reviewed'
+DELETED = 'deleted'
+KNOWN = 'known'
+OPEN_STATES = (PENDING, PRETAGGED)
+
+
+def _with_misc(data, misc):
+    """JSON-encoded record with misc tags folded into its misc list, or None for None"""
+    if data is None:
+        return None
+    record = json.loads(data)
+    record['misc'] = merge_tags(record.get('misc', []), misc)
+    return json.dumps(record, ensure_ascii=False)
+
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class WorkQueue:
+    """Persistent per-item review state for the dirty kaomoji files"""
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self._init_schema()
+
+    def _init_schema(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, 1, SCHEMA_VERSION):
+            raise RuntimeError(f"{self.path} has schema version {version}, expected {SCHEMA_VERSION}")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS sources (
+                name TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                emoji_id TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                state TEXT NOT NULL,
+                raw TEXT NOT NULL,
+                tagged TEXT,
+                result TEXT,
+                session TEXT
+            );
+            CREATE INDEX IF NOT EXISTS items_state ON items (state, source, seq);
+            CREATE INDEX IF NOT EXISTS items_session ON items (session);
+            CREATE TABLE IF NOT EXISTS sessions (
+                name TEXT PRIMARY KEY,
+                exported INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS members (
+                source TEXT NOT NULL,
+                emoji_id TEXT NOT NULL,
+                PRIMARY KEY (source, emoji_id)
+            );
+        ''')
+        with self.conn:
+            if version == 1:
+                # Version 1 only knew the file each item was first queued from
+                self.conn.execute('INSERT OR IGNORE INTO members (source, emoji_id) SELECT source, emoji_id FROM items')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _open_clause(self):
+        return f"state IN ({', '.join('?' * len(OPEN_STATES))})"
+
+    def enqueue_file(self, path):
+        """Import the kaomoji of a dirty file; unchanged files are not re-read
+
+        Ids the queue already knows keep their state, so decided kaomoji are
+        never queued twice; known ones are reopened with the new data. The
+        misc tags of a kaomoji that is already open or reviewed are folded
+        into its queued data or its result.
+
+        Returns:
+            Number of newly queued kaomoji
+        """
+        path = Path(path)
+        stamp = file_stamp(path)
+        recorded = self.conn.execute('SELECT mtime_ns, size FROM sources WHERE name = ?', (path.name,)).fetchone()
+        if recorded == stamp:
+            return 0
+
+        with open(path, 'r', encoding='utf-8') as f:
+            messy_data = json.load(f)
+        STATS.read_file(path, stamp[1])
+        with self.conn:
+            self._fold_duplicates(messy_data)
+            before = self.conn.total_changes
+            next_seq = self.conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM items').fetchone()[0]
+            self.conn.executemany(
+                '''INSERT INTO items (emoji_id, seq, source, state, raw) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (emoji_id) DO UPDATE SET
+                       seq = excluded.seq, source = excluded.source, state = excluded.state,
+                       raw = excluded.raw, tagged = NULL, result = NULL, session = NULL
+                   WHERE items.state = ?''',
+                ((kaomoji_id, next_seq + i, path.name, PENDING, json.dumps(kaomoji_data, ensure_ascii=False), KNOWN)
+                 for i, (kaomoji_id, kaomoji_data) in enumerate(messy_data.items())),
+            )
+            added = self.conn.total_changes - before
+            self.conn.executemany('INSERT OR IGNORE INTO members (source, emoji_id) VALUES (?, ?)',
+                                  ((path.name, kaomoji_id) for kaomoji_id in messy_data))
+            self._record_source(path.name, stamp)
+        return added
+
+    def _fold_duplicates(self, messy_data):
+        """Merge the misc tags of ids that are already open or reviewed into their rows"""
+        updates = []
+        for kaomoji_id, kaomoji_data in messy_data.items():
+            row = self.conn.execute('SELECT state, raw, tagged, result FROM items WHERE emoji_id = ?',
+                                    (kaomoji_id,)).fetchone()
+            if row is None or row[0] not in (*OPEN_STATES, REVIEWED):
+                continue
+            misc = kaomoji_data.get('misc', [])
+            updates.append((*(_with_misc(data, misc) for data in row[1:]), kaomoji_id))
+        self.conn.executemany('UPDATE items SET raw = ?, tagged = ?, result = ? WHERE emoji_id = ?', updates)
+
+    def _record_source(self, name, stamp):
+        self.conn.execute('INSERT OR REPLACE INTO sources (name, mtime_ns, size) VALUES (?, ?, ?)',
+                          (name, *stamp))
+
+    def record_source(self, path):
+        """Remember a dirty file the cleaner rewrote itself, so it is not re-imported"""
+        path = Path(path)
+        with self.conn:
+            if path.exists():
+                self._record_source(path.name, file_stamp(path))
+            else:
+                self.conn.execute('DELETE FROM sources WHERE name = ?', (path.name,))
+                self.conn.execute('DELETE FROM members WHERE source = ?', (path.name,))
+
+    def attach_pretagged(self, records):
+        """Store auto-tagged records for items that are still open
+
+        A record keeps the queued misc tags, which include those folded in
+        from other dirty files holding the same kaomoji.
+        """
+        updates = []
+        for kaomoji_id, record in records.items():
+            row = self.conn.execute(f'SELECT raw FROM items WHERE emoji_id = ? AND {self._open_clause()}',
+                                    (kaomoji_id, *OPEN_STATES)).fetchone()
+            if row is not None:
+                record = dict(record, misc=json.loads(row[0]).get('misc', []))
+                updates.append((PRETAGGED, json.dumps(record, ensure_ascii=False), kaomoji_id))
+        with self.conn:
+            self.conn.executemany('UPDATE items SET state = ?, tagged = ? WHERE emoji_id = ?', updates)
+
+    def claim(self, source=None, limit=None):
+        """Next open items in queue order
+
+        Returns:
+            List of (emoji_id, messy data, pre-tagged record or None)
+        """
+        query = f'SELECT emoji_id, raw, tagged FROM items WHERE {self._open_clause()}'
+        params = list(OPEN_STATES)
+        if source is not None:
+            query += ' AND source = ?'
+            params.append(source)
+        query += ' ORDER BY seq'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return [(kaomoji_id, json.loads(raw), json.loads(tagged) if tagged else None)
+                for kaomoji_id, raw, tagged in self.conn.execute(query, params)]
+
+    def open_contents(self):
+        """Mapping of emoji_id to messy data for every open item, in queue order"""
+        return {kaomoji_id: kaomoji_data for kaomoji_id, kaomoji_data, _ in self.claim()}
+
+    def commit(self, session, decisions):
+        """Atomically record decisions: emoji_id to the accepted entry, or None if deleted"""
+        with self.conn:
+            self.conn.executemany(
+                f'UPDATE items SET state = ?, result = ?, session = ? WHERE emoji_id = ? AND {self._open_clause()}',
+                ((REVIEWED if entry is not None else DELETED,
+                  json.dumps(entry, ensure_ascii=False) if entry is not None else None,
+                  session, kaomoji_id, *OPEN_STATES)
+                 for kaomoji_id, entry in decisions.items()),
+            )
+
+    def mark_known(self, session, kaomoji_ids):
+        """Settle already cleaned kaomoji that brought nothing new to merge"""
+        with self.conn:
+            self.conn.executemany(
+                f'UPDATE items SET state = ?, session = ? WHERE emoji_id = ? AND {self._open_clause()}',
+                ((KNOWN, session, kaomoji_id, *OPEN_STATES) for kaomoji_id in kaomoji_ids),
+            )
+
+    def decided_ids(self, source):
+        """Ids from a dirty file that are no longer open, whichever file queued them
+
+        Exported items have no row left, so they count as decided too.
+        """
+        return {kaomoji_id for (kaomoji_id,) in self.conn.execute(
+            f'''SELECT emoji_id FROM members WHERE source = ?
+                AND emoji_id NOT IN (SELECT emoji_id FROM items WHERE {self._open_clause()})''',
+            (source, *OPEN_STATES))}
+
+    def source_order(self):
+        """Dirty file names with open items, in the order of their first open item"""
+        return [source for (source,) in self.conn.execute(
+            f'SELECT source FROM items WHERE {self._open_clause()} GROUP BY source ORDER BY MIN(seq)',
+            OPEN_STATES)]
+
+    def counts(self):
+        return dict(self.conn.execute('SELECT state, COUNT(*) FROM items GROUP BY state'))
+
+    def start_session(self, name):
+        with self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO sessions (name) VALUES (?)', (name,))
+
+    def unexported_sessions(self):
+        """Sessions that were interrupted before their shard was written, oldest first"""
+        return [name for (name,) in self.conn.execute(
+            'SELECT name FROM sessions WHERE exported = 0 ORDER BY name')]
+
+    def session_size(self, name):
+        return self.conn.execute('SELECT COUNT(*) FROM items WHERE session = ?', (name,)).fetchone()[0]
+
+    def export_session(self, name, cleaned_dir):
+        """Write a session's reviewed kaomoji to its cleaned shard
+
+        The reviewed and known rows are dropped once the shard is on disk; from
+        then on the cleaned corpus (and the seen-id index built over it) knows
+        them.
+        """
+        output_path = Path(cleaned_dir) / name
+        saved = {kaomoji_id: json.loads(result) for kaomoji_id, result in self.conn.execute(
+            'SELECT emoji_id, result FROM items WHERE session = ? AND state = ? ORDER BY seq', (name, REVIEWED))}
+        tmp_path = output_path.with_name(output_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        STATS.wrote_file(tmp_path.stat().st_size)
+        os.replace(tmp_path, output_path)
+
+        with self.conn:
+            self.conn.execute('DELETE FROM items WHERE session = ? AND state IN (?, ?)', (name, REVIEWED, KNOWN))
+            self.conn.execute('UPDATE sessions SET exported = 1 WHERE name = ?', (name,))
+        return output_path, len(saved)
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the state of the cleaning work queue')
+    parser.add_argument('--queue', default=str(QUEUE_PATH), help='Path of the queue database')
+    args = parser.parse_args()
+
+    if not Path(args.queue).exists():
+        print(f"No work queue at {args.queue}")
+        return
+
+    queue = WorkQueue(args.queue)
+    counts = queue.counts()
+    for state in (PENDING, PRETAGGED, REVIEWED, DELETED, KNOWN):
+        print(f"  {state}: {counts.get(state, 0)}")
+    for name in queue.unexported_sessions():
+        print(f"  Unfinished session: {name} ({queue.session_size(name)} decisions)")
+    queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+'''
+Kaomonger Workspace
+Locates the directory holding the corpus (cleaned/, canonical/) and the
+working state (dirty_json/, pretagged/, the work queue and HTTP cache)
+
+The emoji data ships inside the package; everything the tools write lives
+in the workspace. That is $KAOMONGER_HOME when it is set, otherwise the
+checkout the package is imported from. The keyword lists reviewers extend
+(species.txt, emotions.txt) are the package's own copies in a checkout,
+where git tracks them, and copies seeded from the package in any other
+workspace.
+'''
+import os
+import shutil
+from pathlib import Path
+
+from . import WorkspaceError
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+HOME_ENV = 'KAOMONGER_HOME'
+
+
+def find_root():
+    """Workspace root: $KAOMONGER_HOME, else the checkout containing the package
+
+    Raises:
+        WorkspaceError: Installed outside a checkout without $KAOMONGER_HOME
+    """
+    home = os.environ.get(HOME_ENV)
+    if home:
+        return Path(home).expanduser().resolve()
+    checkout = PACKAGE_DIR.parent
+    if (checkout / 'cleaned').is_dir() or (checkout / 'pyproject.toml').is_file():
+        return checkout
+    raise WorkspaceError(
+        f"no workspace found ({checkout} is not a checkout with a cleaned/ directory); "
+        f"set {HOME_ENV} to the directory holding cleaned/ and dirty_json/")
+
+
+ROOT_DIR = find_root()
+CLEANED_DIR = ROOT_DIR / 'cleaned'
+
+KEYWORD_FILES = ('species.txt', 'emotions.txt')
+
+
+def keyword_dir(root=None):
+    """Directory of the editable keyword lists, seeding them on first use"""
+    root = ROOT_DIR if root is None else Path(root)
+    if root == PACKAGE_DIR.parent:
+        return PACKAGE_DIR
+    for name in KEYWORD_FILES:
+        path = root / name
+        if not path.exists():
+            root.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(PACKAGE_DIR / name, path)
+    return root
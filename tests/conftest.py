@@ -0,0 +1,37 @@
+import hashlib
+import json
+
+import pytest
+
+
+def make_entry(content, species=(), emotion=(), misc=(), dotArt=False, hasEmoji=False, multiLine=False):
+    return {
+        'content': content,
+        'species': list(species),
+        'emotion': list(emotion),
+        'misc': list(misc),
+        'dotArt': dotArt,
+        'hasEmoji': hasEmoji,
+        'multiLine': multiLine,
+    }
+
+
+def emoji_id(content):
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+
+@pytest.fixture
+def cleaned_dir(tmp_path):
+    """Cleaned directory with one shard and the sidecars the tools leave next to it"""
+    path = tmp_path / 'cleaned'
+    path.mkdir()
+    shard = {emoji_id(content): make_entry(content, species=species, emotion=emotion, misc=misc)
+             for content, species, emotion, misc in [
+                 ('(=^･ω･^=)', ['cat'], ['happy'], ['cat', 'happy']),
+                 ('ʕ•ᴥ•ʔ', ['bear'], [], ['bear', 'cute']),
+             ]}
+    (path / 'cleaned_kaomoji_20240101_000000.json').write_text(json.dumps(shard), encoding='utf-8')
+    # Written by older versions of the seen-id index: a dict of name -> [mtime, size]
+    (path / '.seen_ids.json').write_text(json.dumps({'cleaned_kaomoji_20240101_000000.json': [1, 2]}))
+    (path / 'notes.json').write_text(json.dumps(['not', 'a', 'shard']))
+    return path
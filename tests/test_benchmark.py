@@ -0,0 +1,15 @@
+from kaomonger import benchmark
+from kaomonger.autotag import KEYWORDS
+
+
+def test_stages_run_against_fixed_keywords():
+    live = KEYWORDS.species, KEYWORDS.emotions
+    with benchmark.fixed_keywords():
+        assert KEYWORDS.species.match(['neko', 'bear']) == ['cat', 'bear']
+        corpus = benchmark.build_corpus(60, benchmark.parse_mix(benchmark.DEFAULT_MIX), seed=3, per_page=20)
+        tagged = [tag for record in corpus['tagged'].values() for tag in record['species'] + record['emotion']]
+        assert set(tagged) <= {line.partition(' = ')[0]
+                               for line in benchmark.BENCH_SPECIES + benchmark.BENCH_EMOTIONS}
+        for name, stage in benchmark.STAGES.items():
+            assert stage(corpus) == len(corpus['messy']) or name == 'parse_html'
+    assert (KEYWORDS.species, KEYWORDS.emotions) == live
@@ -0,0 +1,38 @@
+import pytest
+
+from kaomonger.classify import classify, classify_many
+from kaomonger.emoji_index import SEQUENCE_END, EmojiIndex, load_emoji_index, parse_emoji_data
+
+
+@pytest.mark.parametrize('content', [
+    '#️⃣', '1️⃣', '*️⃣',   # keycaps as typed, with VS16
+    '#⃣', '1⃣',                                # keycaps as listed in emoji_data.txt
+    '🇯🇵', '🏳️‍🌈', '👩‍💻', '❤️', '😀',
+    '(^_^)ノ 1️⃣',
+])
+def test_emoji_is_detected(content):
+    assert classify(content).hasEmoji
+
+
+@pytest.mark.parametrize('content', ['#', '1', '*', '#1', '(^_^)#', '#️', 'ʕ•ᴥ•ʔ'])
+def test_bare_keycap_bases_are_not_emoji(content):
+    assert not classify(content).hasEmoji
+
+
+def test_classify_many_matches_classify():
+    contents = ['#️⃣', '#', '⣿⣿⣿\n⣿⣿⣿', '', '🇯🇵 (^_^)']
+    assert classify_many(contents) == [classify(content) for content in contents]
+
+
+def test_selector_is_optional_only_inside_sequences(tmp_path):
+    data = tmp_path / 'emoji_data.txt'
+    data.write_text('0023 20E3 ; text\n1F1EF 1F1F5 ; text\n2764 ; text\n', encoding='utf-8')
+    index = parse_emoji_data(data)
+    assert index.sequences[0x23][0x20E3] == {SEQUENCE_END: {}}
+    assert index.has_emoji('#️⃣') and index.has_emoji('#⃣')
+    assert index.has_emoji('❤') and not index.has_emoji('#️')
+
+
+def test_empty_index_matches_nothing():
+    assert not EmojiIndex([], [], {}).has_emoji('😀')
+    assert load_emoji_index().is_emoji_codepoint(0x1F600)
@@ -0,0 +1,22 @@
+import io
+
+from kaomonger.instrument import Stats
+
+
+def test_progress_ends_with_stage_summary():
+    stats = Stats()
+    stats.start_progress(2, 'kaomojis')
+    stream = stats.progress.stream = io.StringIO()
+    for _ in range(2):
+        with stats.stage('classify'):
+            pass
+        stats.advance()
+    stats.finish_progress()
+
+    lines = stream.getvalue().split('\n')
+    assert '[2/2]' in lines[0]
+    assert lines[1].startswith('Wall time: ')
+    assert lines[2].split()[::2] == ['classify', '2']
+    assert stats.progress is None
+    stats.finish_progress()
+    assert stream.getvalue().count('Wall time') == 1
@@ -0,0 +1,28 @@
+from kaomonger.keywords import KeywordList
+
+
+def test_flush_skips_tags_written_meanwhile(tmp_path):
+    path = tmp_path / 'species.txt'
+    path.write_text('cat\n', encoding='utf-8')
+    keywords = KeywordList(path)
+    assert keywords.add(['Bear', 'fox', 'cat']) == ['Bear', 'fox']
+
+    # Another reviewer's session appends one of the pending tags first
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('bear\n# more\n')
+
+    assert keywords.flush() == ['fox']
+    assert path.read_text(encoding='utf-8').split('\n') == ['cat', 'bear', '# more', '', 'fox']
+    assert keywords.match(['bear', 'fox']) == ['bear', 'fox']
+
+
+def test_flush_writes_each_tag_once(tmp_path):
+    path = tmp_path / 'emotions.txt'
+    path.write_text('happy', encoding='utf-8')
+    keywords = KeywordList(path)
+    keywords.add(['sad'])
+    assert keywords.flush() == ['sad']
+    assert keywords.flush() == []
+    keywords.add(['sad', 'angry'])
+    assert keywords.flush() == ['angry']
+    assert path.read_text(encoding='utf-8') == 'happy\nsad\nangry'
@@ -0,0 +1,45 @@
+import random
+
+from kaomonger.near_duplicates import (_EMPTY_SLOT, BANDS, NUM_HASHES, ROWS_PER_BAND, canonical_form,
+                                       cluster_variants, jaccard, minhash, shingles)
+
+ALPHABET = '^_-oO0°•ω∀◕‿ᴥ･ﾟ*;:><TДд@'
+
+
+def random_short_kaomoji(rng, count):
+    return ['(' + ''.join(rng.choice(ALPHABET) for _ in range(rng.randrange(3, 9))) + ')' for _ in range(count)]
+
+
+def band_keys(content):
+    signature = minhash(shingles(canonical_form(content)))
+    return {(band, tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])) for band in range(BANDS)}
+
+
+def test_short_kaomoji_fill_every_slot():
+    signature = minhash(shingles('(^_^)'))
+    assert len(signature) == NUM_HASHES
+    assert _EMPTY_SLOT not in signature
+
+
+def test_unrelated_short_kaomoji_share_no_band():
+    kaomoji = random_short_kaomoji(random.Random(7), 200)
+    keys = {content: band_keys(content) for content in kaomoji}
+    for i, a in enumerate(kaomoji):
+        for b in kaomoji[i + 1:]:
+            if not shingles(canonical_form(a)) & shingles(canonical_form(b)):
+                assert not keys[a] & keys[b], (a, b)
+
+
+def test_short_variants_are_clustered():
+    rng = random.Random(1)
+    contents = {}
+    pairs = set()
+    for i, base in enumerate(random_short_kaomoji(rng, 300)):
+        contents[f'base{i}'] = base
+        variant = base + rng.choice('ﾉ/!~')
+        if jaccard(shingles(canonical_form(base)), shingles(canonical_form(variant))) >= 0.8:
+            contents[f'variant{i}'] = variant
+            pairs.add(frozenset((f'base{i}', f'variant{i}')))
+    assert pairs
+    clusters = {frozenset(members) for members in cluster_variants(contents)}
+    assert pairs <= clusters
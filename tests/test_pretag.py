@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from kaomonger import autotag, pretag
+from kaomonger.keywords import KeywordRegistry
+
+from conftest import emoji_id
+
+
+@pytest.fixture
+def keywords(tmp_path, monkeypatch):
+    keyword_dir = tmp_path / 'keywords'
+    keyword_dir.mkdir()
+    (keyword_dir / 'species.txt').write_text('cat\n', encoding='utf-8')
+    (keyword_dir / 'emotions.txt').write_text('happy\n', encoding='utf-8')
+    registry = KeywordRegistry(keyword_dir)
+    monkeypatch.setattr(autotag, 'KEYWORDS', registry)
+    monkeypatch.setattr(pretag, 'KEYWORDS', registry)
+    return registry
+
+
+def test_keywords_added_during_review_tag_staged_records(tmp_path, keywords):
+    dirty_file = tmp_path / 'animals_kaomoji_messy.json'
+    dirty_file.write_text(json.dumps({
+        emoji_id('ʕ•ᴥ•ʔ'): {'content': 'ʕ•ᴥ•ʔ', 'misc': ['bear', 'happy']},
+        emoji_id('(=^･ω･^=)'): {'content': '(=^･ω･^=)', 'misc': ['cat']},
+    }), encoding='utf-8')
+    staging_dir = tmp_path / 'pretagged'
+    staging_dir.mkdir()
+    pretag.pretag_file(dirty_file, staging_dir)
+
+    records = pretag.load_pretagged(dirty_file, staging_dir)
+    bear = records[emoji_id('ʕ•ᴥ•ʔ')]
+    assert bear['species'] == []
+
+    # The reviewer adds 'bear' while reviewing an earlier kaomoji of the file
+    keywords.add(['bear'], [])
+    assert pretag.rematch_keywords(bear)['species'] == ['bear']
+    assert bear['emotion'] == ['happy']
+
+
+def test_staged_records_match_single_auto_tagging(tmp_path, keywords):
+    messy_data = {emoji_id(content): {'content': content, 'misc': misc} for content, misc in [
+        ('(=^･ω･^=)', ['Cat', 'happy']),
+        ('#️⃣ (^_^)', ['count']),
+        ('⣿⣿⣿⣿\n⣿⣿⣿⣿', ['art']),
+        ('(^　^)', []),
+        ('', ['empty']),
+    ]}
+    dirty_file = tmp_path / 'mixed_kaomoji_messy.json'
+    dirty_file.write_text(json.dumps(messy_data), encoding='utf-8')
+    staging_dir = tmp_path / 'pretagged'
+    staging_dir.mkdir()
+    assert pretag.pretag_file(dirty_file, staging_dir) == len(messy_data)
+
+    records = pretag.load_pretagged(dirty_file, staging_dir)
+    assert records == {kaomoji_id: autotag.auto_tag_kaomoji(kaomoji_data)
+                       for kaomoji_id, kaomoji_data in messy_data.items()}
+    assert records[emoji_id('#️⃣ (^_^)')]['hasEmoji']
+    assert records[emoji_id('⣿⣿⣿⣿\n⣿⣿⣿⣿')]['dotArt']
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from kaomonger import preview
+from kaomonger.preview import PREVIEW_LINES, PREVIEW_WIDTH, PreviewCache, render_preview
+
+from conftest import emoji_id
+
+
+def assert_bounded(preview):
+    lines = preview.split('\n')
+    assert len(lines) <= PREVIEW_LINES
+    assert max(len(line) for line in lines) <= PREVIEW_WIDTH
+
+
+@pytest.mark.parametrize('rows, columns', [(300, 200), (30, 1000), (1000, 10)])
+def test_large_braille_art_is_thumbnailed(rows, columns):
+    rng = random.Random(rows * columns)
+    art = '\n'.join(''.join(chr(0x2800 + rng.randrange(256)) for _ in range(columns)) for _ in range(rows))
+    preview = render_preview(art)
+    assert_bounded(preview)
+    assert 'thumbnail' in preview.rsplit('\n', 1)[-1]
+
+
+@pytest.mark.parametrize('rows, columns', [(300, 200), (5, 5000), (2000, 3)])
+def test_large_text_art_is_clipped(rows, columns):
+    art = '\n'.join(('(╯°□°)╯︵ ┻━┻ ' * columns)[:columns] for _ in range(rows))
+    preview = render_preview(art)
+    assert_bounded(preview)
+    assert 'thumbnail' not in preview
+
+
+def test_small_content_is_unchanged():
+    assert render_preview('(=^･ω･^=)') == '(=^･ω･^=)'
+
+
+def test_cache_is_invalidated_when_content_changes(tmp_path):
+    cache = PreviewCache(tmp_path / 'previews.sqlite')
+    try:
+        old = '\n'.join(['old line'] * 100)
+        new = '\n'.join(['new line'] * 100)
+        assert cache.get('abc', old) == render_preview(old)
+        assert cache.lookup('abc', old)[0] == render_preview(old)
+        assert cache.lookup('abc', new)[0] is None
+        assert cache.get('abc', new) == render_preview(new)
+        assert cache.lookup('abc', old)[0] is None
+        assert cache.build([('abc', new), ('def', old)]) == 1
+    finally:
+        cache.close()
+
+
+def test_build_skips_non_shard_json(cleaned_dir, monkeypatch, capsys):
+    monkeypatch.setattr('sys.argv', ['preview', '-s', str(cleaned_dir), '--build'])
+    preview.main()
+    assert capsys.readouterr().out == 'Rendered 2 of 2 previews\n'
+
+    monkeypatch.setattr('sys.argv', ['preview', '-s', str(cleaned_dir), emoji_id('ʕ•ᴥ•ʔ')])
+    preview.main()
+    assert capsys.readouterr().out == 'ʕ•ᴥ•ʔ\n'
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from conftest import emoji_id, make_entry
+
+from kaomonger import emoji_index
+from kaomonger.emoji_index import parse_emoji_data
+from kaomonger.keywords import KeywordRegistry
+from kaomonger.reclassify import Reclassifier
+
+SHARD = 'cleaned_kaomoji_20240101_000000.json'
+
+
+@pytest.fixture
+def keyword_dir(tmp_path):
+    path = tmp_path / 'keywords'
+    path.mkdir()
+    (path / 'species.txt').write_text('cat\n', encoding='utf-8')
+    (path / 'emotions.txt').write_text('happy\n', encoding='utf-8')
+    return path
+
+
+def write_shard(cleaned_dir, entries):
+    cleaned_dir.mkdir(exist_ok=True)
+    shard = {emoji_id(entry['content']): entry for entry in entries}
+    (cleaned_dir / SHARD).write_text(json.dumps(shard, ensure_ascii=False), encoding='utf-8')
+
+
+def read_shard(cleaned_dir):
+    shard = json.loads((cleaned_dir / SHARD).read_text(encoding='utf-8'))
+    return {entry['content']: entry for entry in shard.values()}
+
+
+def run(cleaned_dir, keyword_dir, baseline=None):
+    reclassifier = Reclassifier(cleaned_dir, KeywordRegistry(keyword_dir))
+    try:
+        reclassifier.sync(baseline)
+        return reclassifier.reclassify()
+    finally:
+        reclassifier.close()
+
+
+def use_emoji_data(monkeypatch, tmp_path, lines):
+    path = tmp_path / 'emoji_data.txt'
+    path.write_text(''.join(f'{line} ; text\n' for line in lines), encoding='utf-8')
+    monkeypatch.setattr(emoji_index, '_loaded_index', parse_emoji_data(path))
+
+
+def test_first_run_fixes_values_of_the_original_rules(tmp_path, keyword_dir):
+    cleaned_dir = tmp_path / 'cleaned'
+    write_shard(cleaned_dir, [
+        # '#' and digits are keycap sequence elements the original cleaner took for emoji
+        make_entry('#1 (^_^)', hasEmoji=True),
+        make_entry('(^_^)ノ 1️⃣', hasEmoji=True),
+        # No rule ever flagged these code points: the reviewer did
+        make_entry('εつ▄█▀█●', hasEmoji=True),
+    ])
+    totals = run(cleaned_dir, keyword_dir)
+    assert (totals['rechecked'], totals['updated']) == (3, 1)
+    entries = read_shard(cleaned_dir)
+    assert not entries['#1 (^_^)']['hasEmoji']
+    assert entries['(^_^)ノ 1️⃣']['hasEmoji']
+    assert entries['εつ▄█▀█●']['hasEmoji']
+
+    assert run(cleaned_dir, keyword_dir)['rechecked'] == 0
+
+
+def test_stored_baseline_follows_the_current_rules(tmp_path, keyword_dir):
+    cleaned_dir = tmp_path / 'cleaned'
+    write_shard(cleaned_dir, [make_entry('εつ▄█▀█●', hasEmoji=True),
+                              make_entry('(=^･ω･^=)', misc=['Cat'])])
+    run(cleaned_dir, keyword_dir, baseline='stored')
+    entries = read_shard(cleaned_dir)
+    assert not entries['εつ▄█▀█●']['hasEmoji']
+    assert entries['(=^･ω･^=)']['species'] == ['cat']
+
+
+def test_keyword_change_keeps_reviewer_tags(tmp_path, keyword_dir):
+    cleaned_dir = tmp_path / 'cleaned'
+    write_shard(cleaned_dir, [
+        # The reviewer dropped 'cat' and added 'lion'
+        make_entry('(=^･ω･^=)', species=['lion'], misc=['cat', 'fox']),
+        make_entry('ʕ•ᴥ•ʔ', misc=['bear']),
+    ])
+    assert run(cleaned_dir, keyword_dir, baseline='current')['rechecked'] == 0
+
+    (keyword_dir / 'species.txt').write_text('cat\nfox\n', encoding='utf-8')
+    totals = run(cleaned_dir, keyword_dir)
+    assert (totals['rechecked'], totals['updated']) == (1, 1)
+    assert totals['changes']['species'] == (1, 1)
+    entries = read_shard(cleaned_dir)
+    assert entries['(=^･ω･^=)']['species'] == ['lion', 'fox']
+    assert entries['ʕ•ᴥ•ʔ']['species'] == []
+
+
+def test_code_point_change_rechecks_only_entries_holding_it(monkeypatch, tmp_path, keyword_dir):
+    use_emoji_data(monkeypatch, tmp_path, ['2764'])
+    cleaned_dir = tmp_path / 'cleaned'
+    write_shard(cleaned_dir, [
+        make_entry('(☺‿☺)'),
+        # The reviewer unticked hasEmoji although ❤ is an emoji
+        make_entry('(☺ω❤)'),
+        make_entry('(❤ω❤)', hasEmoji=True),
+    ])
+    run(cleaned_dir, keyword_dir, baseline='current')
+
+    use_emoji_data(monkeypatch, tmp_path, ['2764', '263A'])
+    totals = run(cleaned_dir, keyword_dir)
+    assert (totals['rechecked'], totals['updated']) == (2, 1)
+    assert totals['changes']['hasEmoji'] == (1, 1)
+    entries = read_shard(cleaned_dir)
+    assert entries['(☺‿☺)']['hasEmoji']
+    assert not entries['(☺ω❤)']['hasEmoji']
+    assert entries['(❤ω❤)']['hasEmoji']
@@ -0,0 +1,130 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from kaomonger import review_buffer
+from kaomonger.keywords import KeywordRegistry
+from kaomonger.search_index import SearchIndex
+
+from conftest import emoji_id, make_entry
+
+
+@pytest.fixture
+def reviewer(cleaned_dir, tmp_path, monkeypatch):
+    """Keywords and corpus suggestions for review_batch from cleaned_dir; Enter at every prompt"""
+    keyword_dir = tmp_path / 'keywords'
+    keyword_dir.mkdir()
+    (keyword_dir / 'species.txt').write_text('cat\nbear\n', encoding='utf-8')
+    (keyword_dir / 'emotions.txt').write_text('happy\n', encoding='utf-8')
+    monkeypatch.setattr(review_buffer, 'KEYWORDS', KeywordRegistry(keyword_dir))
+    monkeypatch.setattr(review_buffer, 'SearchIndex', lambda: SearchIndex(cleaned_dir))
+    monkeypatch.setattr(review_buffer, '_tag_index', review_buffer._NOT_LOADED)
+    monkeypatch.setattr('builtins.input', lambda prompt='': '')
+
+
+@pytest.fixture
+def review(reviewer, monkeypatch):
+    """review_batch with an editor that accepts the buffer as is"""
+    monkeypatch.setenv('EDITOR', 'true')
+
+    def run():
+        content = '(=^ω^=)'
+        record = make_entry(content, misc=['catt', 'happy'])
+        decisions = review_buffer.review_batch([(emoji_id(content), record)])
+        assert decisions == {emoji_id(content): record}
+    return run
+
+
+def test_review_ignores_non_shard_json(review, cleaned_dir):
+    review()
+    assert review_buffer.corpus_tag_index() is not None
+
+
+def test_review_survives_broken_corpus(review, cleaned_dir, capsys):
+    (cleaned_dir / 'cleaned_kaomoji_20240102_000000.json').write_text(json.dumps({'abc': ['not', 'an', 'entry']}))
+    review()
+    assert review_buffer.corpus_tag_index() is None
+    assert 'no corpus tag suggestions' in capsys.readouterr().out
+
+
+@pytest.fixture
+def editor(reviewer, monkeypatch):
+    """Fake editor applying one edit function per opened buffer; returns the buffers it saw"""
+    buffers = []
+
+    def use(*edits):
+        def run(args):
+            path = Path(args[-1])
+            text = path.read_text(encoding='utf-8')
+            buffers.append(text)
+            path.write_text(edits[len(buffers) - 1](text), encoding='utf-8')
+        monkeypatch.setattr(review_buffer, 'subprocess', SimpleNamespace(run=run))
+        return buffers
+    return use
+
+
+def record_span(text, kaomoji_id):
+    """Start and end of one record in a batch buffer, delimiter included"""
+    start = text.index(review_buffer.RECORD_DELIMITER.format(kaomoji_id))
+    ends = [text.find(marker, start + 1) for marker in ('##### KAOMOJI', review_buffer.REFERENCE_MARKER)]
+    return start, min(end for end in ends if end != -1)
+
+
+def edit_record(text, kaomoji_id, old, new):
+    """Replace old with new inside one record of a batch buffer"""
+    start, end = record_span(text, kaomoji_id)
+    assert old in text[start:end]
+    return text[:start] + text[start:end].replace(old, new, 1) + text[end:]
+
+
+def remove_record(text, kaomoji_id):
+    start, end = record_span(text, kaomoji_id)
+    return text[:start] + text[end:]
+
+
+RECORDS = [(emoji_id(content), make_entry(content, species=species, misc=misc))
+           for content, species, misc in [
+               ('(=^ω^=)', ['cat'], ['cat']),
+               ('ʕ•ᴥ•ʔ', [], ['bear', 'cute']),
+               ('(・_・;)', [], ['awkward']),
+           ]]
+
+
+def test_batch_buffer_round_trips_every_record(reviewer):
+    edited = review_buffer.split_batch(review_buffer.format_batch(RECORDS))
+    assert list(edited) == [kaomoji_id for kaomoji_id, _ in RECORDS]
+    for kaomoji_id, record in RECORDS:
+        sections = review_buffer.parse_sections(edited[kaomoji_id])
+        assert review_buffer.apply_sections(record, sections) == dict(record, delete=False)
+
+
+def test_parse_sections_leaves_out_missing_sections():
+    sections = review_buffer.parse_sections('CONTENT:\n(^_^)\n\nSPECIES:\n["cat"]\n\nMETADATA:\n{}\n')
+    assert sections == {'CONTENT': '(^_^)', 'SPECIES': '["cat"]', 'METADATA': '{}'}
+
+
+def test_review_batch_applies_edits_per_record(editor):
+    (cat_id, cat), (bear_id, bear), (sweat_id, _) = RECORDS
+    buffers = editor(lambda text: remove_record(
+        edit_record(text, bear_id, 'SPECIES:\n[]', 'SPECIES:\n["bear"]'), sweat_id))
+    decisions = review_buffer.review_batch(RECORDS)
+    assert len(buffers) == 1
+    assert decisions == {cat_id: cat, bear_id: dict(bear, species=['bear']), sweat_id: None}
+
+
+def test_broken_record_is_reopened_alone_with_its_error(editor):
+    (cat_id, cat), (bear_id, bear), (sweat_id, sweat) = RECORDS
+    broken = 'SPECIES:\n["bear",]'
+    buffers = editor(
+        lambda text: edit_record(text, bear_id, 'SPECIES:\n[]', broken),
+        lambda text: edit_record(text, bear_id, broken, 'SPECIES:\n["bear"]'),
+    )
+    decisions = review_buffer.review_batch(RECORDS)
+
+    reopened = review_buffer.split_batch(buffers[1])
+    assert list(reopened) == [bear_id]
+    assert reopened[bear_id].lstrip('\n').startswith('# ERROR: could not parse JSON')
+    assert broken in reopened[bear_id]
+    assert decisions == {cat_id: cat, sweat_id: sweat, bear_id: dict(bear, species=['bear'])}
@@ -0,0 +1,114 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from conftest import emoji_id
+
+from kaomonger.instrument import STATS
+from kaomonger.scrape_to_messy_json import (HttpCache, build_messy_json, iter_kaomoji, make_session,
+                                            scrape_category)
+
+
+def combo(content, keyphrases, combo_hash='h', classes='box-module combo-ctn'):
+    return (f'<div class="{classes}" data-combo-hash="{combo_hash}" '
+            f'data-keyphrases="{keyphrases}" data-combo="{content}"></div>')
+
+
+PAGE = (
+    '<!DOCTYPE html><html><head><title>wolf</title></head><body>\n'
+    + combo('  (ᵔᴥᵔ)  ', 'wolf, cute', 'a1')
+    + '<p>not a kaomoji</p><div class="box-module" data-combo="(x_x)"></div>\n'
+    + combo('(=^･ω･^=)\n(ﾉ◕ヮ◕)ﾉ', 'cat,happy', 'b2')
+    + '</body></html>\n'
+)
+
+
+def contents(records):
+    return [record['content'] for record in records]
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 64])
+def test_records_do_not_depend_on_chunk_boundaries(size):
+    chunks = [PAGE[i:i + size] for i in range(0, len(PAGE), size)]
+    assert list(iter_kaomoji(chunks)) == list(iter_kaomoji([PAGE]))
+    assert contents(iter_kaomoji(chunks)) == ['(ᵔᴥᵔ)', '(=^･ω･^=)\n(ﾉ◕ヮ◕)ﾉ']
+
+
+def test_entities_are_decoded_before_hashing():
+    page = combo('&lt;3 &#x1F43A; &amp;quot;awoo&amp;quot; &#12471;', 'love &lt;3, wolf')
+    [record] = iter_kaomoji([page])
+    assert record['content'] == '<3 🐺 &quot;awoo&quot; シ'
+    assert record['tags'] == ['love <3', 'wolf']
+    assert record['emoji_id'] == emoji_id(record['content'])
+
+
+def test_attributes_and_classes_in_any_order():
+    page = ('<div data-combo="(・ω・)" id="x" data-keyphrases="shy" '
+            'class="featured combo-ctn box-module" data-combo-hash="c3"></div>'
+            '<DIV CLASS="box-module combo-ctn" DATA-COMBO-HASH="d4" DATA-KEYPHRASES="sad" DATA-COMBO="(;_;)">')
+    records = list(iter_kaomoji([page]))
+    assert [(r['content'], r['tags'], r['combo_hash']) for r in records] == [
+        ('(・ω・)', ['shy'], 'c3'), ('(;_;)', ['sad'], 'd4')]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.path != '/wolf':
+            self.send_error(404)
+            return
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = PAGE.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    pytest.importorskip('requests')
+    StubHandler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_scrape_category_downloads_then_revalidates(stub_server, tmp_path):
+    import requests
+
+    output_dir = tmp_path / 'dirty_json'
+    output_dir.mkdir()
+    cache = HttpCache(tmp_path / 'cache')
+    session = make_session(retries=0)
+    STATS.reset()
+    try:
+        assert scrape_category(session, 'wolf', output_dir, stub_server, cache) == (2, 0)
+        saved = (output_dir / 'wolf_kaomoji_messy.json').read_text(encoding='utf-8')
+        assert json.loads(saved) == build_messy_json(iter_kaomoji([PAGE]))
+
+        assert scrape_category(session, 'wolf', output_dir, stub_server, cache) == (2, 0)
+        assert STATS.counters['cache_hits'] == 1
+        assert (output_dir / 'wolf_kaomoji_messy.json').read_text(encoding='utf-8') == saved
+
+        with pytest.raises(requests.HTTPError):
+            scrape_category(session, 'fox', output_dir, stub_server, cache)
+    finally:
+        session.close()
+        STATS.reset()
+    assert StubHandler.requests == [('/wolf', None), ('/wolf', '"v1"'), ('/fox', None)]
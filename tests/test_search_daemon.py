@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from kaomonger.search_daemon import SearchServer
+
+from conftest import emoji_id
+
+
+@pytest.fixture
+def server(cleaned_dir, tmp_path):
+    server = SearchServer(tmp_path / 'daemon.sock', cleaned_dir, poll_interval=0)
+    yield server
+    server.server_close()
+
+
+def test_failed_refresh_keeps_last_good_index(server, cleaned_dir, capsys):
+    rows = list(server.answer('query', {}, []))
+    assert len(rows) == 2
+
+    (cleaned_dir / 'cleaned_kaomoji_20240102_000000.json').write_text(json.dumps({'abc': ['broken']}))
+    for _ in range(3):
+        server.service_actions()
+        assert list(server.answer('query', {}, [])) == rows
+    assert capsys.readouterr().err.count('re-indexing failed') == 1
+
+    (cleaned_dir / 'cleaned_kaomoji_20240102_000000.json').write_text(json.dumps({}))
+    server.service_actions()
+    assert list(server.answer('query', {}, ['bear'])) == [server.index.row(emoji_id('ʕ•ᴥ•ʔ'))]
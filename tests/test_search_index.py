@@ -0,0 +1,23 @@
+from kaomonger.search_index import SearchIndex
+from kaomonger.seen_index import LEGACY_MANIFEST_NAME, SeenIndex
+
+from conftest import emoji_id
+
+
+def test_refresh_only_indexes_shards(cleaned_dir):
+    index = SearchIndex(cleaned_dir)
+    try:
+        assert index.refresh() == 1
+        rows = list(index.query())
+        assert sorted(row.split('\t', 1)[0] for row in rows) == sorted([emoji_id('(=^･ω･^=)'), emoji_id('ʕ•ᴥ•ʔ')])
+        assert list(index.query(tags=['cat'])) == [index.row(emoji_id('(=^･ω･^=)'))]
+    finally:
+        index.close()
+
+
+def test_seen_manifest_is_not_json(cleaned_dir):
+    seen = SeenIndex(cleaned_dir)
+    assert emoji_id('ʕ•ᴥ•ʔ') in seen
+    assert not seen.manifest_path.name.endswith('.json')
+    assert seen.manifest_path.exists()
+    assert not (cleaned_dir / LEGACY_MANIFEST_NAME).exists()
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from kaomonger.work_queue import DELETED, KNOWN, PENDING, WorkQueue
+
+from conftest import emoji_id
+
+CONTENT = '(=^･ω･^=)'
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(tmp_path / 'queue.sqlite')
+    yield queue
+    queue.close()
+
+
+def write_dirty(path, misc):
+    path.write_text(json.dumps({emoji_id(CONTENT): {'content': CONTENT, 'misc': misc}}), encoding='utf-8')
+    return path
+
+
+def test_known_kaomoji_is_queued_again_after_export(queue, tmp_path):
+    (tmp_path / 'cleaned').mkdir()
+    queue.start_session('cleaned_kaomoji_1.json')
+    assert queue.enqueue_file(write_dirty(tmp_path / 'a_kaomoji_messy.json', ['cat'])) == 1
+    queue.mark_known('cleaned_kaomoji_1.json', [emoji_id(CONTENT)])
+    assert queue.decided_ids('a_kaomoji_messy.json') == {emoji_id(CONTENT)}
+    assert queue.counts() == {KNOWN: 1}
+
+    queue.export_session('cleaned_kaomoji_1.json', tmp_path / 'cleaned')
+    assert queue.counts() == {}
+    assert queue.enqueue_file(write_dirty(tmp_path / 'b_kaomoji_messy.json', ['cat', 'neko'])) == 1
+    assert [data['misc'] for _, data, _ in queue.claim()] == [['cat', 'neko']]
+
+
+def test_known_kaomoji_reopens_before_export(queue, tmp_path):
+    queue.enqueue_file(write_dirty(tmp_path / 'a_kaomoji_messy.json', ['cat']))
+    queue.mark_known('cleaned_kaomoji_1.json', [emoji_id(CONTENT)])
+    assert queue.enqueue_file(write_dirty(tmp_path / 'b_kaomoji_messy.json', ['neko'])) == 1
+    assert queue.counts() == {PENDING: 1}
+    assert queue.decided_ids('b_kaomoji_messy.json') == set()
+
+
+def test_deleted_kaomoji_stays_deleted(queue, tmp_path):
+    queue.enqueue_file(write_dirty(tmp_path / 'a_kaomoji_messy.json', ['cat']))
+    queue.commit('cleaned_kaomoji_1.json', {emoji_id(CONTENT): None})
+    assert queue.enqueue_file(write_dirty(tmp_path / 'b_kaomoji_messy.json', ['neko'])) == 0
+    assert queue.counts() == {DELETED: 1}
+
+
+def write_messy(path, entries):
+    path.write_text(json.dumps({emoji_id(content): {'content': content, 'misc': misc}
+                                for content, misc in entries}), encoding='utf-8')
+    return path
+
+
+def test_kaomoji_in_two_files_is_decided_in_both(queue, tmp_path):
+    (tmp_path / 'cleaned').mkdir()
+    wolf = write_messy(tmp_path / 'wolf_kaomoji_messy.json', [(CONTENT, ['wolf'])])
+    dog = write_messy(tmp_path / 'dog_kaomoji_messy.json', [(CONTENT, ['dog', 'cute']), ('U・ᴥ・U', ['dog'])])
+    assert queue.enqueue_file(wolf) + queue.enqueue_file(dog) == 2
+
+    # One item, carrying the misc tags of both copies, also when pre-tagged
+    queue.attach_pretagged({emoji_id(CONTENT): {'content': CONTENT, 'misc': ['wolf'], 'species': []}})
+    [(_, raw, tagged)] = [item for item in queue.claim() if item[0] == emoji_id(CONTENT)]
+    assert raw['misc'] == tagged['misc'] == ['wolf', 'dog', 'cute']
+    assert queue.source_order() == ['wolf_kaomoji_messy.json', 'dog_kaomoji_messy.json']
+
+    session = 'cleaned_kaomoji_1.json'
+    queue.start_session(session)
+    queue.commit(session, {emoji_id(CONTENT): {'content': CONTENT, 'misc': tagged['misc']}})
+    assert queue.decided_ids('wolf_kaomoji_messy.json') == {emoji_id(CONTENT)}
+    assert queue.decided_ids('dog_kaomoji_messy.json') == {emoji_id(CONTENT)}
+
+    # A third copy arriving before export still reaches the reviewed entry
+    write_messy(tmp_path / 'cute_kaomoji_messy.json', [(CONTENT, ['fluffy'])])
+    assert queue.enqueue_file(tmp_path / 'cute_kaomoji_messy.json') == 0
+    output_path, saved = queue.export_session(session, tmp_path / 'cleaned')
+    assert json.loads(output_path.read_text())[emoji_id(CONTENT)]['misc'] == ['wolf', 'dog', 'cute', 'fluffy']
+
+    # Once exported, the id is still cleared out of a file that was not rewritten yet
+    assert queue.decided_ids('dog_kaomoji_messy.json') == {emoji_id(CONTENT)}
+    assert queue.source_order() == ['dog_kaomoji_messy.json']
@@ -0,0 +1,40 @@
+import pytest
+
+from kaomonger import WorkspaceError, workspace
+from kaomonger.keywords import KeywordRegistry
+
+
+def test_home_overrides_checkout(tmp_path, monkeypatch):
+    monkeypatch.setenv(workspace.HOME_ENV, str(tmp_path))
+    assert workspace.find_root() == tmp_path.resolve()
+
+
+def test_checkout_is_default(monkeypatch):
+    monkeypatch.delenv(workspace.HOME_ENV, raising=False)
+    assert workspace.find_root() == workspace.PACKAGE_DIR.parent
+
+
+def test_missing_workspace_is_reported(tmp_path, monkeypatch):
+    monkeypatch.delenv(workspace.HOME_ENV, raising=False)
+    monkeypatch.setattr(workspace, 'PACKAGE_DIR', tmp_path / 'site-packages' / 'kaomonger')
+    with pytest.raises(WorkspaceError, match=workspace.HOME_ENV):
+        workspace.find_root()
+
+
+def test_keyword_lists_are_seeded_into_the_workspace(tmp_path):
+    package_species = (workspace.PACKAGE_DIR / 'species.txt').read_bytes()
+    assert workspace.keyword_dir(tmp_path) == tmp_path
+    assert (tmp_path / 'species.txt').read_bytes() == package_species
+
+    registry = KeywordRegistry(workspace.keyword_dir(tmp_path))
+    registry.add(['wolfie'], [])
+    registry.flush()
+    assert (tmp_path / 'species.txt').read_text(encoding='utf-8').endswith('\nwolfie')
+    assert (workspace.PACKAGE_DIR / 'species.txt').read_bytes() == package_species
+    # Seeded once; later runs keep the workspace's additions
+    workspace.keyword_dir(tmp_path)
+    assert 'wolfie' in (tmp_path / 'species.txt').read_text(encoding='utf-8')
+
+
+def test_checkout_edits_the_tracked_keyword_lists():
+    assert workspace.keyword_dir(workspace.PACKAGE_DIR.parent) == workspace.PACKAGE_DIR